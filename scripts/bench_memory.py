@@ -0,0 +1,85 @@
+"""Benchmark the memory used by the ImagePaths of large galleries.
+
+Usage: bench_memory.py [size...]
+
+Compare the memory held by ImagePaths created by create_paths() against
+the previous ImagePath class, which had a __dict__ and kept the whole path
+argument of each file, on synthetic paths of each size (default 10000,
+100000 and 1000000 paths). Paths are generated as they are read, as from
+--files-from, so the memory of the path strings is counted too.
+"""
+
+import gc
+import pathlib
+import random
+import sys
+import tracemalloc
+
+import galleryviewer.main
+from galleryviewer.main import ImagePath, create_paths
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+# pylint: disable-next=too-few-public-methods
+class LegacyImagePath:
+    """ImagePath before it had __slots__, for comparison."""
+
+    def __init__(self, arg, index, sort_key=None):
+        self.arg = arg
+        self.index = index
+        self.sort_key = sort_key
+        self.info = None
+        self.meta_record = None
+
+    @property
+    def path(self):
+        return pathlib.Path(self.arg)
+
+
+def synthetic_paths(size, seed=0):
+    """Yield *size* paths, about a thousand to a directory."""
+    rng = random.Random(seed)
+    dirs = [f"Pictures/{rng.choice(['Scans', 'photos', 'IMG_'])}{rng.randrange(1000)}"
+            for _ in range(max(1, size // 1000))]
+    for _ in range(size):
+        yield (f"{rng.choice(dirs)}/{rng.choice(['img', 'Page', 'DSC'])}"
+               f"{rng.randrange(100_000)}_{rng.randrange(100):02d}.jpg")
+
+
+def legacy_paths(paths):
+    """Call create_paths() with LegacyImagePath in place of ImagePath."""
+    galleryviewer.main.ImagePath = LegacyImagePath
+    try:
+        return create_paths(paths)
+    finally:
+        galleryviewer.main.ImagePath = ImagePath
+
+
+def held_memory(func, size):
+    """Return the bytes still allocated after *func* creates *size* paths."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        files = func(synthetic_paths(size))
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del files
+    return held
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'paths':>9} {'legacy':>10} {'ImagePath':>10} {'per path':>13} "
+          f"{'saved':>6}")
+    for size in sizes:
+        before = held_memory(legacy_paths, size)
+        after = held_memory(create_paths, size)
+        print(f"{size:>9} {before / 2**20:>8.1f}MB {after / 2**20:>8.1f}MB "
+              f"{before / size:>5.0f}B {after / size:>5.0f}B "
+              f"{1 - after / before:>5.0%}")
+
+
+if __name__ == "__main__":
+    main()
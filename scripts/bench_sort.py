@@ -0,0 +1,52 @@
+"""Benchmark human sorting of paths with create_paths().
+
+Usage: bench_sort.py [size...]
+
+Compare the sort keys cached by create_paths() against sorting with
+alphanum_key() on synthetic path lists of each size (default 10000, 100000
+and 1000000 paths).
+"""
+
+import random
+import sys
+import time
+
+from galleryviewer.main import alphanum_key, create_paths
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def synthetic_paths(size, seed=0):
+    rng = random.Random(seed)
+    dirs = [f"{rng.choice(['Scans', 'photos', 'IMG_'])}{rng.randrange(1000)}"
+            for _ in range(max(1, size // 1000))]
+    return [f"{rng.choice(dirs)}/{rng.choice(['img', 'Page', 'DSC'])}"
+            f"{rng.randrange(100_000)}_{rng.randrange(100):02d}.jpg"
+            for _ in range(size)]
+
+
+def alphanum_sort(paths):
+    return sorted(paths, key=lambda arg: alphanum_key(arg.casefold()))
+
+
+def best_of(func, arg, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'paths':>9} {'alphanum_key':>13} {'create_paths':>13} {'speedup':>8}")
+    for size in sizes:
+        paths = synthetic_paths(size)
+        before = best_of(alphanum_sort, paths)
+        after = best_of(create_paths, paths)
+        print(f"{size:>9} {before:>12.3f}s {after:>12.3f}s {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Benchmark galleryviewer on synthetic inputs and check for regressions.
+
+Usage: benchmark.py [--scale FACTOR] [--repeat N] [--output FILE]
+                    [--baseline FILE [--save | --threshold RATIO]]
+
+Time sorting of paths with alphanum_key() and create_paths(), test_paths()
+on a temporary tree of files, load_data_file() on a large JSON file, and
+main() rendering with each builtin profile, each at several sizes so that
+their scaling can be compared. Sizes are multiplied by FACTOR.
+
+Results are the best of N runs in seconds. They can be written as JSON to
+FILE, or saved as the baseline. With a baseline, exit with status 1 if
+any benchmark got slower than its baseline by more than RATIO (default
+0.25, i.e. 25%).
+"""
+
+import argparse
+import functools
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from galleryviewer import __version__
+from galleryviewer.main import (EX_OK, alphanum_key, create_paths,
+                                load_data_file, main as galleryviewer_main,
+                                test_paths)
+
+SORT_SIZES = [10_000, 100_000, 1_000_000]
+TREE_SIZES = [1_000, 10_000]
+DATA_SIZES = [10_000, 100_000]
+RENDER_SIZES = [1_000, 10_000, 100_000]
+BUILTIN_PROFILES = ["builtin/default.html", "builtin/dark.html",
+                    "builtin/virtual.html"]
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.25
+
+_WORDS = ["Scans", "photos", "IMG_", "Page", "dsc", "Vacation 2019", "v1.2"]
+_EXTENSIONS = ["jpg", "JPG", "png", "webp"]
+
+
+def synthetic_paths(size, seed=0):
+    """Return *size* relative paths with mixed digits and case, up to 6 deep."""
+    rng = random.Random(seed)
+    dirs = ["/".join(f"{rng.choice(_WORDS)}{rng.randrange(100)}"
+                     for _ in range(rng.randint(1, 5)))
+            for _ in range(max(1, size // 100))]
+    return [f"{rng.choice(dirs)}/{rng.choice(_WORDS)}{rng.randrange(100_000)}"
+            f"_{rng.randrange(100):02d}.{rng.choice(_EXTENSIONS)}"
+            for _ in range(size)]
+
+
+def best_of(func, repeat=DEFAULT_REPEAT):
+    """Return the shortest time in seconds of *repeat* calls of *func*."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def scaled(sizes, scale):
+    return [max(1, round(size * scale)) for size in sizes]
+
+
+def _alphanum_sort_key(arg):
+    return alphanum_key(arg.casefold())
+
+
+def _render(argv):
+    if galleryviewer_main(argv) != EX_OK:
+        raise RuntimeError(f"rendering failed: {argv}")
+
+
+def bench_sort(sizes, repeat):
+    for size in sizes:
+        paths = synthetic_paths(size)
+        yield f"sort/alphanum_key/{size}", best_of(
+            functools.partial(sorted, paths, key=_alphanum_sort_key), repeat)
+        yield f"sort/create_paths/{size}", best_of(
+            functools.partial(create_paths, paths), repeat)
+
+
+def bench_test_paths(sizes, repeat, directory):
+    for size in sizes:
+        root = os.path.join(directory, f"tree-{size}")
+        paths = synthetic_paths(size)
+        for path in paths:
+            path = os.path.join(root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb'):
+                pass
+        files = create_paths([os.path.join(root, path) for path in paths], "none")
+        yield f"test_paths/{size}", best_of(functools.partial(test_paths, files),
+                                            repeat)
+
+
+def bench_load_data_file(sizes, repeat, directory):
+    for size in sizes:
+        path = os.path.join(directory, f"data-{size}.json")
+        rng = random.Random(size)
+        records = [{"path": arg, "caption": f"Image {ind}",
+                    "rating": rng.random(), "tags": rng.sample(_WORDS, 3)}
+                   for ind, arg in enumerate(synthetic_paths(size))]
+        with open(path, 'w', encoding="UTF-8") as file:
+            json.dump(records, file)
+        yield f"load_data_file/{size}", best_of(
+            functools.partial(load_data_file, path), repeat)
+
+
+def bench_render(sizes, repeat, directory):
+    output = os.path.join(directory, "output.html")
+    for size in sizes:
+        paths_file = os.path.join(directory, f"paths-{size}.txt")
+        with open(paths_file, 'w', encoding="UTF-8") as file:
+            file.writelines(f"{path}\n" for path in synthetic_paths(size))
+        for profile in BUILTIN_PROFILES:
+            argv = ["--no-test", "--no-cache", "--profile", profile,
+                    "--files-from", paths_file, "--output", output]
+            yield f"render/{profile}/{size}", best_of(
+                functools.partial(_render, argv), repeat)
+
+
+def run_benchmarks(scale=1, repeat=DEFAULT_REPEAT):
+    """Return a dict of benchmark names and their best times in seconds."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        benchmarks = [
+            bench_sort(scaled(SORT_SIZES, scale), repeat),
+            bench_test_paths(scaled(TREE_SIZES, scale), repeat, directory),
+            bench_load_data_file(scaled(DATA_SIZES, scale), repeat, directory),
+            bench_render(scaled(RENDER_SIZES, scale), repeat, directory),
+        ]
+        for benchmark in benchmarks:
+            for name, seconds in benchmark:
+                results[name] = seconds
+                size = int(name.rsplit("/", 1)[1])
+                print(f"{name:<40} {seconds:>10.4f}s "
+                      f"{seconds / size * 1e6:>9.3f}us/item", file=sys.stderr)
+    return results
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return (name, seconds, baseline seconds) of benchmarks that regressed.
+
+    >>> find_regressions({"a": 1.3, "b": 1.0, "c": 9.0}, {"a": 1.0, "b": 1.0})
+    [('a', 1.3, 1.0)]
+    """
+    return [(name, seconds, baseline[name]) for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+
+def load_results(path):
+    with open(path, encoding="UTF-8") as file:
+        return json.load(file)["results"]
+
+
+def save_results(path, results, scale, repeat):
+    record = {"galleryviewer": __version__,
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "scale": scale,
+              "repeat": repeat,
+              "results": results}
+    with open(path, 'w', encoding="UTF-8") as file:
+        json.dump(record, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def get_cla():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--scale", metavar="FACTOR", type=float, default=1,
+                        help="multiply the sizes of all inputs by FACTOR")
+    parser.add_argument("--repeat", metavar="N", type=int, default=DEFAULT_REPEAT,
+                        help="time the best of N runs")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare the results with those in FILE")
+    parser.add_argument("--save", action="store_true",
+                        help="save the results as the new --baseline")
+    parser.add_argument("--threshold", metavar="RATIO", type=float,
+                        default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown relative to the baseline "
+                             "(default %(default)s)")
+    return parser
+
+
+def main():
+    parser = get_cla()
+    args = parser.parse_args()
+    if args.save and args.baseline is None:
+        parser.error("argument --save: requires --baseline")
+    baseline = None
+    if args.baseline is not None and not args.save:
+        try:
+            baseline = load_results(args.baseline)
+        except (OSError, ValueError, KeyError) as err:
+            parser.error(f"unable to load baseline (create it with --save): {err}")
+    results = run_benchmarks(args.scale, args.repeat)
+    if args.output is not None:
+        save_results(args.output, results, args.scale, args.repeat)
+    if args.save:
+        save_results(args.baseline, results, args.scale, args.repeat)
+    if baseline is None:
+        return 0
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, seconds, baseline in regressions:
+        print(f"regression: {name} took {seconds:.4f}s, "
+              f"{seconds / baseline - 1:.0%} slower than {baseline:.4f}s",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
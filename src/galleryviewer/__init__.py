@@ -1,2 +1,11 @@
 __version__ = "0.8.0"
 _PROG = "galleryviewer"
+
+
+def __getattr__(name):
+    # Import the renderer only when it's used, to keep startup fast
+    if name == "Renderer":
+        from .renderer import Renderer
+
+        return Renderer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,156 @@
+"""Render a gallery into every directory of a tree that contains images."""
+
+import logging
+import os
+
+from .main import (EX_OK, EX_OUTPUT, StatCache, _FatalError, create_paths,
+                   emit, from_string_cached, get_bytecode_cache,
+                   get_environment, is_image_name, load_data_file,
+                   load_template, probe_files, read_template_source)
+from .workers import current_renderer, init_worker, process_renderer
+
+DEFAULT_OUTPUT_NAME = "index.html"
+
+
+# pylint: disable-next=too-many-instance-attributes,too-few-public-methods
+class DirectoryRenderer:
+    """Render the images of single directories into documents inside them.
+
+    The environment and template are built once, when the instance is
+    created, and reused for every directory. The template is compiled from
+    *template_source* if given, or else loaded by the name *profile*. Errors
+    loading the template raise _FatalError.
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, profiles, profile, template_source=None, *,
+                 cache=True, data=None, title=None,
+                 sort_method=None, caseless=True, probe=False, minify=False,
+                 precompress=False, output_name=DEFAULT_OUTPUT_NAME):
+        bytecode_cache = get_bytecode_cache() if cache else None
+        env = get_environment(profiles, minify=minify,
+                              bytecode_cache=bytecode_cache)
+        if template_source is None:
+            self.template = load_template(env, name=profile)
+        else:
+            self.template = from_string_cached(env, template_source)
+        self.data = {} if data is None else data
+        self.title = title
+        self.sort_method = sort_method
+        self.caseless = caseless
+        self.cache = cache
+        self.probe = probe
+        self.precompress = precompress
+        self.output_name = output_name
+
+    def render(self, directory, names):
+        """Render the images *names* in *directory*.
+
+        Return None on success, or a message describing why the output could
+        not be written.
+        """
+        stat_cache = StatCache(directory)
+        files = create_paths(names, self.sort_method, caseless=self.caseless,
+                             stat_cache=stat_cache)
+        if self.probe:
+            probe_files(files, cache=self.cache, directory=directory,
+                        stat_cache=stat_cache)
+        context = {
+            "title": self.title or os.path.basename(os.path.abspath(directory)),
+            "files": files,
+            "data": self.data,
+            "pagination": None
+        }
+        path = os.path.join(directory, self.output_name)
+        try:
+            with open(path, 'w', encoding="UTF-8") as outfile:
+                emit(outfile, self.template, context,
+                     compressed_path=path if self.precompress else None)
+        except OSError as err:
+            return str(err)
+        return None
+
+
+def find_image_directories(root):
+    """Yield (directory, names) for every directory under *root* with images.
+
+    *names* are the names of the image files in *directory*. Symbolic links
+    to directories are not followed.
+    """
+    for directory, _, filenames in os.walk(root):
+        names = [name for name in filenames if is_image_name(name)]
+        if names:
+            yield directory, names
+
+
+def render_directory(task):
+    """Render *task*, a (directory, names) pair, with the process renderer."""
+    directory, names = task
+    return directory, current_renderer().render(directory, names)
+
+
+def render_tree(root, renderer_args, renderer_kwargs, jobs=None):
+    """Render a document into every directory under *root* with images.
+
+    The documents are rendered by up to *jobs* processes (default: one per
+    CPU), each with a DirectoryRenderer built from *renderer_args* and
+    *renderer_kwargs*. Errors loading the template raise _FatalError before
+    any documents are rendered.
+
+    Return the number of directories whose documents could not be written.
+    """
+    # Fail early on template errors. Forked workers inherit this renderer.
+    with process_renderer(DirectoryRenderer(*renderer_args, **renderer_kwargs)):
+        tasks = find_image_directories(root)
+        if jobs == 1:
+            results = map(render_directory, tasks)
+            return _count_failures(results)
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+                max_workers=jobs, initializer=init_worker,
+                initargs=(DirectoryRenderer, renderer_args,
+                          renderer_kwargs)) as executor:
+            results = executor.map(render_directory, tasks, chunksize=16)
+            return _count_failures(results)
+
+
+def _count_failures(results):
+    failures = 0
+    for directory, error in results:
+        if error is None:
+            logging.debug("rendered %s", directory)
+        else:
+            logging.error("unable to write to output in %s: %s", directory, error)
+            failures += 1
+    return failures
+
+
+def render_recursive(args, config):
+    """Render a document into every directory under args.recursive."""
+    try:
+        data = load_data_file(file=args.data_file)
+        # Read once here, as workers that aren't forked can't read stdin
+        template_source = None
+        if args.template is not None:
+            template_source = read_template_source(args.template)
+    except _FatalError as err:
+        return err.status
+    renderer_args = (list(config.profiles.items()), args.profile, template_source)
+    renderer_kwargs = {
+        "cache": args.cache,
+        "probe": args.probe,
+        "data": data,
+        "title": args.title,
+        "sort_method": args.sort,
+        "caseless": args.ignore_case,
+        "minify": args.minify,
+        "precompress": args.precompress,
+        "output_name": args.output or DEFAULT_OUTPUT_NAME
+    }
+    try:
+        failures = render_tree(args.recursive, renderer_args, renderer_kwargs,
+                               jobs=args.jobs)
+    except _FatalError as err:
+        return err.status
+    return EX_OUTPUT if failures else EX_OK
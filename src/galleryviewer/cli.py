@@ -0,0 +1,334 @@
+"""Parse and check the command-line arguments of galleryviewer."""
+
+import argparse
+
+from . import _PROG, __version__
+from .main import STAT_SORT_FIELDS, add_default_suffix
+
+BYTE_SUFFIXES = {"K": 2**10, "M": 2**20, "G": 2**30}
+
+
+def port_number(arg):
+    """Convert *arg* to a TCP port number for argparse."""
+    value = int(arg)
+    if not 0 <= value <= 65535:
+        raise ValueError(arg)
+    return value
+
+
+def byte_size(arg):
+    """Convert *arg*, a size with an optional K, M or G suffix, for argparse.
+
+    >>> byte_size("512"), byte_size("2M")
+    (512, 2097152)
+    """
+    multiplier = BYTE_SUFFIXES.get(arg[-1:].upper())
+    if multiplier is not None:
+        arg = arg[:-1]
+    return non_negative_int(arg) * (multiplier or 1)
+
+
+def non_negative_int(arg):
+    """Convert *arg* to an int not less than zero for argparse."""
+    value = int(arg)
+    if value < 0:
+        raise ValueError(arg)
+    return value
+
+
+def positive_int(arg):
+    """Convert *arg* to an int greater than zero for argparse."""
+    value = int(arg)
+    if value <= 0:
+        raise ValueError(arg)
+    return value
+
+
+class StoreAndAppend(argparse.Action):
+    """Store a value like the "store" action, and also append it to *list_dest*.
+
+    The last value given is the value of the option, and *list_dest* holds
+    every value in the order given.
+    """
+
+    def __init__(self, option_strings, dest, list_dest=None, **kwargs):
+        super().__init__(option_strings, dest, **kwargs)
+        self.list_dest = list_dest
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        items = list(getattr(namespace, self.list_dest, None) or [])
+        setattr(namespace, self.list_dest, items + [values])
+
+
+# pylint: disable-next=too-many-statements
+def get_cla(defaults):
+    """Build and return parser for command-line arguments."""
+    # If defaults does not contain all needed argument defaults, raise
+    # KeyError. This is just easier to debug than providing another layer of
+    # get defaults.
+    parser = argparse.ArgumentParser(
+        prog=_PROG, description="Create an HTML viewer for images")
+    parser.add_argument(
+        "paths", nargs="*", metavar="PATHS",
+        help="image file paths to include in viewer")
+    parser.add_argument(
+        "-V", "--version", action="version",
+        version=f"%(prog)s {__version__}")
+    sorting = parser.add_argument_group("sorting options")
+    sorting.add_argument(
+        "-n", "--check-sort", action="store_true",
+        help="print PATHS in chosen sorting order; don't emit HTML")
+    case = sorting.add_mutually_exclusive_group()
+    case.add_argument(
+        "-c", "--consider-case", action="store_false", dest="ignore_case",
+        default=defaults["ignore_case"],
+        help="consider letter case when sorting PATHS")
+    case.add_argument(
+        "-f", "--ignore-case", action="store_true",
+        default=defaults["ignore_case"],
+        help="casefold PATHS when sorting")
+    sort_method = sorting.add_mutually_exclusive_group()
+    sort_method.add_argument(
+        "--sort", type=str.lower,
+        choices=["none", "ascii", "human", *STAT_SORT_FIELDS],
+        default=defaults["sort"],
+        help="sorting method to apply to PATHS: none (-U), ascii or "
+             "lexicographic, human or natural order (default), or by "
+             "modification time, status change time or size")
+    sort_method.add_argument(
+        "-U", "--no-sort", action="store_const", const="none", dest="sort",
+        help="include PATHS in the order passed without sorting")
+    parser.add_argument(
+        "-m", "--meta-file", metavar="FILE", default=defaults["meta_file"],
+        help="load per-image metadata from %(metavar)s in JSON Lines format")
+    parser.add_argument(
+        "-F", "--files-from", metavar="FILE",
+        help="read additional PATHS from %(metavar)s, one per line "
+             "('-' for stdin)")
+    parser.add_argument(
+        "--scan", metavar="DIR", action="append",
+        help="add the image files found in the directory tree under "
+             "%(metavar)s to PATHS")
+    parser.add_argument(
+        "--include", metavar="PATTERN", action="append",
+        help="with --scan, add the files matching %(metavar)s instead of "
+             "those with image file extensions")
+    parser.add_argument(
+        "--exclude", metavar="PATTERN", action="append",
+        help="with --scan, skip files and directories matching %(metavar)s")
+    parser.add_argument(
+        "--max-depth", metavar="N", type=non_negative_int,
+        help="with --scan, scan at most %(metavar)s levels of directories "
+             "below DIR")
+    parser.add_argument(
+        "-0", "--null", action="store_true",
+        help="PATHS read by --files-from are terminated by a null character "
+             "instead of newline")
+    parser.add_argument(
+        "-d", "--data-file", metavar="FILE", default=defaults["data_file"],
+        help="load data from %(metavar)s in JSON format")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        "-o", "--output", metavar="FILE",
+        action=StoreAndAppend, list_dest="outputs",
+        help="place output into %(metavar)s (default is stdout); if given "
+             "more than once, render each --profile into its own output")
+    output.add_argument(
+        "--output-dir", metavar="DIR",
+        help="place output into %(metavar)s as pages linked by an index page")
+    parser.add_argument(
+        "-r", "--recursive", metavar="DIR",
+        help="write a document into every directory under %(metavar)s that "
+             "contains images, instead of reading PATHS")
+    parser.add_argument(
+        "-j", "--jobs", metavar="N", type=positive_int,
+        help="render --recursive documents, or several outputs, in "
+             "%(metavar)s processes (default is one per CPU)")
+    parser.add_argument(
+        "--page-size", metavar="N", type=positive_int,
+        help="put at most %(metavar)s PATHS on each page of --output-dir")
+    parser.add_argument(
+        "--serve", action="store_true",
+        help="serve the viewer and PATHS over HTTP on the loopback interface, "
+             "rendering it again when its inputs change")
+    parser.add_argument(
+        "--port", metavar="PORT", type=port_number,
+        help="listen on port %(metavar)s with --serve (default 8000)")
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="keep running and render --output again whenever PATHS read "
+             "from --files-from, the template or the data change")
+    parser.add_argument(
+        "--minify", action="store_true",
+        help="minify the CSS and JavaScript included by templates")
+    parser.add_argument(
+        "--embed", action="store_true",
+        help="embed the images into the output, for a single self-contained "
+             "file")
+    parser.add_argument(
+        "--embed-max-size", metavar="SIZE", type=byte_size,
+        help="with --embed, keep referring to images larger than %(metavar)s "
+             "bytes (K, M and G suffixes allowed) by their path")
+    parser.add_argument(
+        "--precompress", action="store_true",
+        help="also write compressed copies of the output, like FILE.gz")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="don't render if no inputs changed since the last build of "
+             "--output, and don't rewrite it if it would be identical")
+    probing = parser.add_mutually_exclusive_group()
+    probing.add_argument(
+        "--probe", action="store_true", default=defaults["probe"],
+        help="read the dimensions of PATHS from their image headers")
+    probing.add_argument(
+        "--no-probe", action="store_false", dest="probe",
+        default=defaults["probe"],
+        help="don't read the dimensions of PATHS")
+    parser.add_argument(
+        "-p", "--profile",
+        default=defaults["profile"], type=add_default_suffix,
+        action=StoreAndAppend, list_dest="profiles",
+        help="use PROFILE instead of %(default)s")
+    parser.add_argument(
+        "-t", "--template", metavar="FILE",
+        help="load template directly from %(metavar)s")
+    testing = parser.add_mutually_exclusive_group()
+    testing.add_argument(
+        "--test", action="store_true", default=defaults["test"],
+        help="exit if not all PATHS exist as files")
+    testing.add_argument(
+        "--no-test", action="store_false",
+        dest="test", default=defaults["test"],
+        help="don't test PATHS for existence")
+    caching = parser.add_mutually_exclusive_group()
+    caching.add_argument(
+        "--cache", action="store_true", default=defaults["cache"],
+        help="cache compiled templates and image metadata")
+    caching.add_argument(
+        "--no-cache", action="store_false", dest="cache",
+        default=defaults["cache"],
+        help="don't cache compiled templates and image metadata")
+    parser.add_argument(
+        "-T", "--title",
+        help="custom title (default is current directory name)")
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="keep running and render the requests of galleryviewer-client "
+             "with the configuration and templates loaded")
+    parser.add_argument(
+        "--socket", metavar="PATH",
+        help="listen for --daemon requests on the Unix socket %(metavar)s")
+    parser.add_argument(
+        "--timings", action="store_true",
+        help="report the time and memory used by each phase on standard "
+             "error, as JSON")
+    parser.add_argument(
+        "--profile-out", metavar="FILE",
+        help="run under cProfile and write the stats to %(metavar)s")
+    parser.set_defaults(outputs=[], profiles=[])
+    return parser
+
+
+def check_args(args, parser):
+    """Exit with a usage error if the parsed arguments *args* don't fit.
+
+    Errors are reported through the ArgumentParser *parser*, like the
+    errors found while parsing.
+    """
+    if args.socket is not None and not args.daemon:
+        parser.error("argument --socket: requires --daemon")
+    if args.daemon:
+        if any((args.paths, args.files_from is not None, args.scan,
+                args.recursive is not None, args.serve, args.watch)):
+            parser.error("argument --daemon: not allowed with PATHS, "
+                         "--files-from, --scan, --recursive, --serve or --watch")
+        return
+    several_outputs = len(args.outputs) > 1
+    if several_outputs:
+        _check_several_outputs(args, parser)
+    if args.recursive is not None:
+        _check_recursive(args, parser)
+        return
+    if not args.paths and args.files_from is None and not args.scan:
+        parser.error("the following arguments are required: PATHS")
+    if not args.scan and (args.include or args.exclude or args.max_depth is not None):
+        parser.error("arguments --include, --exclude and --max-depth: "
+                     "require --scan")
+    if args.jobs is not None and not several_outputs:
+        parser.error("argument -j/--jobs: requires --recursive or several "
+                     "--output")
+    _check_output_options(args, parser)
+    if args.serve:
+        _check_serve(args, parser)
+    if args.watch:
+        _check_watch(args, parser)
+
+
+def _check_several_outputs(args, parser):
+    if len(args.profiles) != len(args.outputs):
+        parser.error("argument -o/--output: given more than once, so each "
+                     "output needs its own -p/--profile")
+    if '-' in args.outputs or len(set(args.outputs)) < len(args.outputs):
+        parser.error("argument -o/--output: must be distinct file names "
+                     "when given more than once")
+    if args.template is not None or args.recursive is not None \
+            or args.serve or args.watch:
+        parser.error("argument -o/--output: given more than once, not "
+                     "allowed with --template, --recursive, --serve or "
+                     "--watch")
+
+
+def _check_recursive(args, parser):
+    if args.paths or args.files_from is not None or args.scan:
+        parser.error("argument -r/--recursive: not allowed with PATHS, "
+                     "--files-from or --scan")
+    if any((args.output_dir is not None, args.check_sort, args.meta_file,
+            args.serve, args.watch, args.embed)):
+        parser.error("argument -r/--recursive: not allowed with --output-dir, "
+                     "--check-sort, --meta-file, --serve, --watch or --embed")
+    if args.output == '-':
+        parser.error("argument -o/--output: must be a file name with "
+                     "--recursive")
+    if args.incremental or args.page_size is not None:
+        parser.error("argument -r/--recursive: not allowed with "
+                     "--incremental or --page-size")
+
+
+def _check_output_options(args, parser):
+    if args.page_size is not None and args.output_dir is None:
+        parser.error("argument --page-size: requires --output-dir")
+    if args.incremental and args.output in {None, '-'}:
+        parser.error("argument --incremental: requires --output=FILE")
+    if args.embed_max_size is not None and not args.embed:
+        parser.error("argument --embed-max-size: requires --embed")
+    if args.embed and (args.output_dir is not None or args.incremental
+                       or args.serve or args.watch):
+        parser.error("argument --embed: not allowed with --output-dir, "
+                     "--incremental, --serve or --watch")
+    if args.port is not None and not args.serve:
+        parser.error("argument --port: requires --serve")
+    if args.precompress and args.output in {None, '-'} and args.output_dir is None:
+        parser.error("argument --precompress: requires --output=FILE or "
+                     "--output-dir")
+
+
+def _check_serve(args, parser):
+    if args.output is not None or args.output_dir is not None \
+            or args.incremental or args.check_sort or args.watch:
+        parser.error("argument --serve: not allowed with --output, "
+                     "--output-dir, --incremental, --check-sort or --watch")
+    if '-' in {args.files_from, args.template}:
+        parser.error("argument --serve: standard input can't be read "
+                     "for every request")
+
+
+def _check_watch(args, parser):
+    if args.output in {None, '-'} or args.incremental or args.check_sort:
+        parser.error("argument --watch: requires --output=FILE, and not "
+                     "allowed with --incremental or --check-sort")
+    if '-' in {args.files_from, args.template}:
+        parser.error("argument --watch: standard input can't be read "
+                     "again")
+    if args.scan:
+        parser.error("argument --watch: not allowed with --scan")
@@ -0,0 +1,100 @@
+"""Run galleryviewer in a daemon, if one is listening, or else in this process.
+
+The client takes the same arguments as galleryviewer. It imports little
+more than the socket module, so that it starts quickly, and passes its
+standard streams and working directory to the daemon (see daemon.py).
+"""
+
+import array
+import os
+import socket
+import sys
+
+from . import _PROG
+
+SOCKET_ENV = "GALLERYVIEWER_SOCKET"
+# Options that keep running or start a daemon, which are never forwarded
+LOCAL_OPTIONS = ("--daemon", "--serve", "--watch")
+# Marker of the message carrying the file descriptors of a request
+REQUEST_MARKER = b"R"
+STANDARD_FDS = (0, 1, 2)
+
+
+def default_socket_path():
+    """Return the path of the daemon socket.
+
+    It is the value of $GALLERYVIEWER_SOCKET if set, or else a file in the
+    user runtime directory, or in the user cache directory.
+    """
+    path = os.getenv(SOCKET_ENV)
+    if path:
+        return path
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"{_PROG}.sock")
+    cache_home = os.getenv("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, _PROG, "daemon.sock")
+
+
+def is_local(argv):
+    """Return True if *argv* must run in this process, not in the daemon.
+
+    >>> is_local(["--watch", "-o", "index.html"]), is_local(["--wat"])
+    (True, True)
+    >>> is_local(["-o", "index.html", "--", "--serve"])
+    False
+    """
+    for arg in argv:
+        if arg == "--":
+            break
+        option = arg.partition("=")[0]
+        if len(option) > 2 and option.startswith("--") \
+                and any(name.startswith(option) for name in LOCAL_OPTIONS):
+            return True
+    return False
+
+
+def forward(argv, path):
+    """Run galleryviewer with *argv* in the daemon listening at *path*.
+
+    Return the exit status, or None if no daemon is listening.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            sock.sendmsg([REQUEST_MARKER],
+                         [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                           array.array("i", STANDARD_FDS))])
+        except OSError:
+            return None
+        request = b"\0".join(os.fsencode(arg) for arg in [os.getcwd(), *argv])
+        sock.sendall(request)
+        sock.shutdown(socket.SHUT_WR)
+        reply = b""
+        while True:
+            chunk = sock.recv(64)
+            if not chunk:
+                break
+            reply += chunk
+    try:
+        return int(reply)
+    except ValueError:
+        print(f"{_PROG}: error: the daemon ended without a reply", file=sys.stderr)
+        return 1
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not is_local(argv):
+        status = forward(argv, default_socket_path())
+        if status is not None:
+            return status
+    from .main import main as local_main
+
+    return local_main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
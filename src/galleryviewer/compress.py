@@ -0,0 +1,98 @@
+"""Write compressed copies of documents while they are rendered."""
+
+import collections
+from contextlib import ExitStack, contextmanager
+
+from .main import replace_atomically
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+ZSTD_LEVEL = 19
+
+
+# Adapter of compressors to the interface of zlib compress objects
+_Compressor = collections.namedtuple("_Compressor", "compress flush")
+
+
+def _gzip_compressor():
+    import zlib
+
+    # A gzip header without a timestamp, for reproducible output
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def _brotli_compressor():
+    import brotli  # type: ignore[import-not-found]  # pylint: disable=import-error
+
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    return _Compressor(compressor.process, compressor.finish)
+
+
+def _zstd_compressor():
+    try:
+        from compression import zstd  # type: ignore[import-not-found]
+    except ImportError:
+        import zstandard  # type: ignore[import-not-found]
+
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zstd.ZstdCompressor(level=ZSTD_LEVEL)
+
+
+# File name suffixes and compressor factories of the encodings
+COMPRESSORS = [(".gz", _gzip_compressor),
+               (".br", _brotli_compressor),
+               (".zst", _zstd_compressor)]
+
+
+def available_compressors():
+    """Return (suffix, compressor) pairs of the encodings that can be used.
+
+    Gzip is always available. Brotli and Zstandard need the brotli and
+    zstandard modules, or Python 3.14 for Zstandard.
+    """
+    compressors = []
+    for suffix, factory in COMPRESSORS:
+        try:
+            compressors.append((suffix, factory()))
+        except ImportError:
+            pass
+    return compressors
+
+
+# pylint: disable-next=too-few-public-methods
+class TeeWriter:
+    """Text stream that writes to *outfile* and compresses to *sinks*.
+
+    *sinks* are (compressor, binary file) pairs.
+    """
+
+    def __init__(self, outfile, sinks, encoding="UTF-8"):
+        self.outfile = outfile
+        self.sinks = sinks
+        self.encoding = encoding
+
+    def write(self, text):
+        self.outfile.write(text)
+        data = text.encode(self.encoding)
+        for compressor, file in self.sinks:
+            file.write(compressor.compress(data))
+        return len(text)
+
+
+@contextmanager
+def precompressed(outfile, path, encoding="UTF-8"):
+    """Return a stream writing to *outfile* and to compressed copies of *path*.
+
+    The copies are named after *path* with the suffix of each available
+    encoding, like index.html.gz. They are written to temporary files that
+    replace them when the block exits, unless their contents are unchanged,
+    or are removed if it raises.
+    """
+    with ExitStack() as stack:
+        sinks = [(compressor, stack.enter_context(
+                     replace_atomically(path + suffix, binary=True,
+                                        if_changed=True)))
+                 for suffix, compressor in available_compressors()]
+        yield TeeWriter(outfile, sinks, encoding)
+        for compressor, file in sinks:
+            file.write(compressor.flush())
@@ -0,0 +1,239 @@
+"""Render the requests of clients in a long-lived process.
+
+The daemon keeps the configuration and the template environment loaded,
+with every template compiled, and forks a process for each request, which
+starts with all of them ready. The configuration is read again when its
+files change, and templates are compiled again when their sources change.
+"""
+
+import array
+import logging
+import os
+import socket
+import sys
+import traceback
+
+from .client import REQUEST_MARKER, STANDARD_FDS
+from .main import (EX_OK, EX_OUTPUT, _FatalError, _shared_environment,
+                   generate_config_paths, load_config, main,
+                   shared_environment)
+from .watch import file_signature
+
+# Seconds between checks for finished request processes
+REAP_INTERVAL = 1.0
+# Seconds that a client may take to send its request
+REQUEST_TIMEOUT = 5.0
+# File name extensions of the templates compiled up front
+TEMPLATE_EXTENSIONS = ["html", "htm", "jinja", "css", "js"]
+
+
+def receive_request(conn):
+    """Return the (file descriptors, working directory, argv) of a request.
+
+    Raise ValueError if the request is malformed.
+    """
+    fds = array.array("i")
+    marker, ancdata, _, _ = conn.recvmsg(
+        len(REQUEST_MARKER), socket.CMSG_SPACE(len(STANDARD_FDS) * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+    if marker != REQUEST_MARKER or len(fds) != len(STANDARD_FDS):
+        for fd in fds:
+            os.close(fd)
+        raise ValueError("expected the standard streams of the client")
+    chunks = []
+    try:
+        while True:
+            chunk = conn.recv(64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError:
+        for fd in fds:
+            os.close(fd)
+        raise
+    cwd, *argv = [os.fsdecode(arg) for arg in b"".join(chunks).split(b"\0")]
+    return list(fds), cwd, argv
+
+
+def compile_templates(env, names=None):
+    """Compile the templates of *env* named *names*, or all of them.
+
+    Return the compiled templates by name. Templates with errors are
+    skipped; they are reported when used.
+    """
+    from jinja2 import TemplateError
+
+    if names is None:
+        names = env.list_templates(extensions=TEMPLATE_EXTENSIONS)
+    templates = {}
+    for name in names:
+        try:
+            templates[name] = env.get_template(name)
+        except (TemplateError, UnicodeError, OSError) as err:
+            logging.debug("not compiling template %s: %s", name, err)
+    return templates
+
+
+class Daemon:
+    """The configuration and templates kept loaded between requests."""
+
+    def __init__(self):
+        self.config = None
+        self.config_signature = None
+        self.env = None
+        # Compiled templates of env by name
+        self.templates = {}
+
+    def refresh(self):
+        """Reload the configuration if its files changed, and the templates.
+
+        Every template is compiled when the environment is created. After
+        that, only the templates whose sources changed are compiled again;
+        templates added since are compiled when used, by the request.
+        """
+        signature = [(path, file_signature(path))
+                     for path in generate_config_paths()]
+        if signature != self.config_signature:
+            if self.config_signature is not None:
+                logging.info("configuration changed, reloading")
+            self.config_signature = signature
+            self.config = load_config()
+            _shared_environment.cache_clear()
+        env = shared_environment(self.config.profiles.items(),
+                                 cache=self.config.options["cache"])
+        if env is not self.env:
+            self.env = env
+            self.templates = compile_templates(env)
+            return
+        stale = [name for name, template in self.templates.items()
+                 if not template.is_up_to_date]
+        for name in stale:
+            del self.templates[name]
+        self.templates.update(compile_templates(env, stale))
+
+    def handle(self, conn, listener):
+        """Run the request on *conn* in a process forked from this one."""
+        try:
+            fds, cwd, argv = receive_request(conn)
+        except (OSError, ValueError) as err:
+            logging.warning("unable to receive request: %s", err)
+            return
+        try:
+            self.refresh()
+            if os.fork() == 0:
+                listener.close()
+                self.run_request(conn, fds, cwd, argv)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def run_request(self, conn, fds, cwd, argv):
+        """Run galleryviewer with *argv* in place of the client; never return.
+
+        The standard streams are replaced by the client's *fds*, and the
+        exit status is sent back on *conn*.
+        """
+        status = 1
+        try:
+            for target, fd in zip(STANDARD_FDS, fds):
+                os.dup2(fd, target)
+            os.chdir(cwd)
+            if "--daemon" in argv:
+                logging.error("the daemon can't start another daemon")
+                status = 2
+            else:
+                status = main(argv, config=self.config)
+        except SystemExit as err:
+            # Exit of argparse, for errors and --help
+            status = err.code if isinstance(err.code, int) else int(bool(err.code))
+        except BaseException:  # pylint: disable=broad-exception-caught
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                conn.sendall(f"{status}\n".encode())
+            finally:
+                os._exit(0)  # pylint: disable=protected-access
+
+
+def reap_children():
+    """Collect the exit status of finished request processes."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+
+
+def bind_socket(path):
+    """Return a socket listening at *path*, accessible to this user only.
+
+    A socket left behind by a daemon that is gone is replaced. Raise
+    _FatalError if another daemon is listening at *path*, or if it can't be
+    bound.
+    """
+    directory = os.path.dirname(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o077)
+    try:
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        try:
+            listener.bind(path)
+        except OSError:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                if probe.connect_ex(path) == 0:
+                    logging.error("a daemon is already listening at %s", path)
+                    raise _FatalError(EX_OUTPUT) from None
+            os.remove(path)
+            listener.bind(path)
+        listener.listen()
+    except OSError as err:
+        listener.close()
+        logging.error("unable to listen: %s", err)
+        raise _FatalError(EX_OUTPUT) from err
+    except _FatalError:
+        listener.close()
+        raise
+    finally:
+        os.umask(old_umask)
+    return listener
+
+
+def serve_daemon(path):
+    """Render the requests of clients connecting to *path* until interrupted.
+
+    Return the exit status.
+    """
+    daemon = Daemon()
+    daemon.refresh()
+    try:
+        listener = bind_socket(path)
+    except _FatalError as err:
+        return err.status
+    logging.info("listening at %s", path)
+    try:
+        with listener:
+            listener.settimeout(REAP_INTERVAL)
+            while True:
+                reap_children()
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    continue
+                with conn:
+                    conn.settimeout(REQUEST_TIMEOUT)
+                    daemon.handle(conn, listener)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return EX_OK
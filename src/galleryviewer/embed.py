@@ -0,0 +1,125 @@
+"""Embed images into documents as data URIs, encoded as they are written."""
+
+import base64
+import logging
+import mmap
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from .main import StatCache
+
+# Bytes of an image encoded at a time; a multiple of 3, so that the encoded
+# pieces need no padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+# Media types by file name extension, for every extension of IMAGE_EXTENSIONS
+MEDIA_TYPES = {".apng": "image/apng",
+               ".avif": "image/avif",
+               ".bmp": "image/bmp",
+               ".gif": "image/gif",
+               ".ico": "image/vnd.microsoft.icon",
+               ".jpeg": "image/jpeg",
+               ".jpg": "image/jpeg",
+               ".jxl": "image/jxl",
+               ".png": "image/png",
+               ".svg": "image/svg+xml",
+               ".tif": "image/tiff",
+               ".tiff": "image/tiff",
+               ".webp": "image/webp"}
+
+
+def encode_chunks(file, chunk_size=ENCODE_CHUNK_SIZE):
+    """Yield the contents of the binary *file* in base64, in pieces.
+
+    The file is mapped into memory instead of being read, and at most
+    *chunk_size* bytes of it are encoded at a time.
+    """
+    if os.fstat(file.fileno()).st_size == 0:
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for start in range(0, len(mapped), chunk_size):
+            yield base64.b64encode(mapped[start:start + chunk_size]).decode("ascii")
+
+
+class Embedder:
+    """Images embedded into a document in place of their paths.
+
+    add() sets the src of an ImagePath to a placeholder, and expand()
+    replaces the placeholders in the rendered document with the data URIs
+    of their images while it is written. Placeholders, like data URIs, are
+    left alone by HTML and JSON escaping.
+    """
+
+    def __init__(self):
+        # A random tag, so that placeholders can't be mistaken for content
+        self.tag = f"galleryviewer-embed-{os.urandom(8).hex()}-"
+        self._pattern = re.compile(f"{re.escape(self.tag)}([0-9]+)")
+        # (path, media type) of each image, by placeholder number
+        self._images = []
+
+    def __len__(self):
+        return len(self._images)
+
+    def add(self, file, media_type):
+        """Embed the image of the ImagePath *file*, of type *media_type*."""
+        file.src = f"{self.tag}{len(self._images)}"
+        self._images.append((file.arg, media_type))
+
+    def data_uri(self, number):
+        """Yield the data URI of image *number* in pieces.
+
+        If the image can't be opened, yield its path as a URL instead, so
+        that it is loaded from the file like images that aren't embedded.
+        """
+        path, media_type = self._images[number]
+        try:
+            file = open(path, 'rb')  # pylint: disable=consider-using-with
+        except OSError as err:
+            logging.warning("unable to embed image: %s", err)
+            yield quote(path)
+            return
+        with file:
+            yield f"data:{media_type};base64,"
+            yield from encode_chunks(file)
+
+    def expand(self, chunks):
+        """Yield the *chunks* of a document with the images of placeholders."""
+        for chunk in chunks:
+            if self.tag not in chunk:
+                yield chunk
+                continue
+            # Pieces alternate between text and placeholder numbers
+            for ind, piece in enumerate(self._pattern.split(chunk)):
+                if ind % 2:
+                    yield from self.data_uri(int(piece))
+                elif piece:
+                    yield piece
+
+
+def embed_files(files, max_size=None, stat_cache=None):
+    """Embed the images of the ImagePaths *files* into documents.
+
+    Only regular files with a known image type and at most *max_size*
+    bytes, if given, are embedded; the other files keep their paths. File
+    status is shared through *stat_cache*. Return the Embedder to pass to
+    emit().
+    """
+    if stat_cache is None:
+        stat_cache = StatCache()
+    stat_cache.update(file.arg for file in files)
+    embedder = Embedder()
+    size = 0
+    for file in files:
+        media_type = MEDIA_TYPES.get(os.path.splitext(file.arg)[1].lower())
+        stat_result = stat_cache.get(file.arg)
+        if media_type is None or stat_result is None \
+                or not stat.S_ISREG(stat_result.st_mode):
+            continue
+        if max_size is not None and stat_result.st_size > max_size:
+            continue
+        embedder.add(file, media_type)
+        size += stat_result.st_size
+    logging.info("embedding %d of %d images, %d bytes", len(embedder),
+                 len(files), size)
+    return embedder
@@ -0,0 +1,235 @@
+"""Read image dimensions from file headers, without decoding the images."""
+
+import logging
+import os
+import struct
+
+from .main import StatCache, get_cache_dir
+
+# Enough for the headers of PNG, GIF and WebP files, and for most JPEG files
+# up to their first frame header
+_HEAD_SIZE = 1024
+# Start-of-frame markers in JPEG files, which hold the image size
+_JPEG_SOF_MARKERS = frozenset({0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                               0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF})
+
+
+class ImageInfo:
+    """Metadata of an image file.
+
+    *format* is one of "jpeg", "png", "gif" or "webp", or None if the format
+    isn't recognized, in which case *width* and *height* are None too.
+    *size* is the size of the file in bytes.
+    """
+
+    __slots__ = ("width", "height", "size", "format")
+
+    def __init__(self, width=None, height=None, size=None, format=None):
+        # pylint: disable=redefined-builtin
+        self.width = width
+        self.height = height
+        self.size = size
+        self.format = format
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(width={self.width!r}, "
+                f"height={self.height!r}, size={self.size!r}, "
+                f"format={self.format!r})")
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def astuple(self):
+        return (self.width, self.height, self.size, self.format)
+
+
+def _png_size(head):
+    if head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _gif_size(head):
+    return struct.unpack("<HH", head[6:10])
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20:21] == b"\x2f":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(file):
+    """Find the size in the first frame header of the JPEG *file*."""
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        # Skip fill bytes before markers
+        while marker[:1] == b"\xff" and marker[1:] == b"\xff":
+            marker = marker[1:] + file.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if 0xD0 <= marker[1] <= 0xD9 or marker[1] == 0x01:
+            # Markers without a segment
+            continue
+        header = file.read(2)
+        if len(header) < 2:
+            return None
+        length, = struct.unpack(">H", header)
+        if marker[1] in _JPEG_SOF_MARKERS:
+            frame = file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(file):
+    """Return (format, (width, height)) from the header of the binary *file*.
+
+    Return (None, None) if the format isn't recognized, and (format, None)
+    if the header is damaged.
+    """
+    head = file.read(_HEAD_SIZE)
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png", _png_size(head)
+    if head[:6] in {b"GIF87a", b"GIF89a"}:
+        return "gif", _gif_size(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", _webp_size(head)
+    if head[:2] == b"\xff\xd8":
+        return "jpeg", _jpeg_size(file)
+    return None, None
+
+
+def probe_image(path, size=None):
+    """Return the ImageInfo of the image file at *path*.
+
+    *size* is the size of the file, if it's already known. Raise OSError if
+    the file can't be read.
+    """
+    with open(path, 'rb') as file:
+        if size is None:
+            size = os.fstat(file.fileno()).st_size
+        try:
+            format_name, dimensions = read_image_size(file)
+        except (struct.error, ValueError):
+            format_name, dimensions = None, None
+    width, height = dimensions or (None, None)
+    return ImageInfo(width, height, size, format_name)
+
+
+class ImageInfoCache:
+    """On-disk cache of ImageInfo keyed by path, modification time and size.
+
+    The cache is an SQLite database at *path* (by default, in the user
+    cache directory). If it can't be opened, a warning is emitted and the
+    cache stays empty.
+    """
+
+    def __init__(self, path=None):
+        self.connection = None
+        if path is None:
+            path = get_cache_dir() / "imageinfo.sqlite3"
+        try:
+            import sqlite3
+        except ImportError:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            self.connection = sqlite3.connect(os.fspath(path))
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS imageinfo (path TEXT PRIMARY KEY, "
+                "mtime_ns INTEGER, size INTEGER, width INTEGER, height INTEGER, "
+                "format TEXT)")
+        except (OSError, sqlite3.Error) as err:
+            logging.warning("not caching image metadata: %s", err)
+            self.connection = None
+
+    def get(self, path, stat):
+        """Return the cached ImageInfo of *path*, if it matches *stat*."""
+        if self.connection is None:
+            return None
+        row = self.connection.execute(
+            "SELECT width, height, size, format FROM imageinfo "
+            "WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        return None if row is None else ImageInfo(*row)
+
+    def update(self, entries):
+        """Store (path, stat, ImageInfo) triples from the iterable *entries*."""
+        if self.connection is None:
+            return
+        rows = [(path, stat.st_mtime_ns, stat.st_size, info.width, info.height,
+                 info.format) for path, stat, info in entries]
+        import sqlite3
+
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO imageinfo VALUES (?, ?, ?, ?, ?, ?)",
+                    rows)
+        except sqlite3.Error as err:
+            logging.warning("unable to cache image metadata: %s", err)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def _probe_or_none(path, size):
+    try:
+        return probe_image(path, size)
+    except OSError:
+        return None
+
+
+# pylint: disable-next=too-many-arguments
+def probe_images(files, cache=None, directory=None, max_workers=None,
+                 stat_cache=None):
+    """Set the info attribute of every ImagePath in *files* to its ImageInfo.
+
+    Paths are relative to *directory*, if given. Files are read concurrently
+    by up to *max_workers* threads. If *cache* (an ImageInfoCache) holds the
+    info of a file that hasn't changed since, only the file's status is
+    read, or taken from *stat_cache* (a StatCache for *directory*) if
+    given. Files that can't be read get an info of None.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if stat_cache is None:
+        stat_cache = StatCache(directory, max_workers)
+    args = [file.arg for file in files]
+    stat_cache.update(args)
+    stats = [stat_cache.get(arg) for arg in args]
+    paths = [os.path.abspath(os.path.join(directory or "", arg)) for arg in args]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # The cache is only used from this thread, as SQLite requires
+        infos = [None if stat is None or cache is None else cache.get(path, stat)
+                 for path, stat in zip(paths, stats)]
+        misses = [ind for ind, (stat, info) in enumerate(zip(stats, infos))
+                  if stat is not None and info is None]
+        for ind, info in zip(misses, executor.map(
+                _probe_or_none, [paths[ind] for ind in misses],
+                [stats[ind].st_size for ind in misses])):
+            infos[ind] = info
+    for file, info in zip(files, infos):
+        file.info = info
+    if cache is not None:
+        cache.update((paths[ind], stats[ind], infos[ind]) for ind in misses
+                     if infos[ind] is not None)
@@ -0,0 +1,114 @@
+"""Per-image records from JSON Lines files, kept only for the images used."""
+
+import json
+import mmap
+
+KEY_FIELD = "path"
+# Value of MetaRecord.value before the record is decoded
+_NOT_LOADED = object()
+
+
+class JsonLinesError(ValueError):
+    """A line of a JSON Lines file is not a valid record."""
+
+    def __init__(self, lineno, msg):
+        super().__init__(f"line {lineno}: {msg}")
+        self.lineno = lineno
+
+
+# pylint: disable-next=too-few-public-methods
+class MetaRecord:
+    """Reference to one record in a JsonLinesIndex.
+
+    The record is *value* if given, or else decoded when first loaded, and
+    kept as long as the reference, which lasts as long as the index.
+    """
+
+    __slots__ = ("index", "start", "end", "value")
+
+    def __init__(self, index, start, end, value=_NOT_LOADED):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.value = value
+
+    def load(self):
+        """Return the record, decoding it if it wasn't given."""
+        if self.value is _NOT_LOADED:
+            self.value = json.loads(self.index.buffer[self.start:self.end])
+        return self.value
+
+
+class JsonLinesIndex:
+    """Byte offsets of the records in a memory-mapped JSON Lines file.
+
+    Each line of the file is a JSON object with a "path" member, which is
+    the key of the record. Blank lines are ignored. The file stays mapped
+    until close() is called.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        try:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            self.buffer = b""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+    def scan(self):
+        """Yield (key, start, end, record) for every record, in file order.
+
+        Every line is decoded to find its key. Raise JsonLinesError if a line
+        is not a JSON object with a string "path" member.
+        """
+        buffer = self.buffer
+        start = 0
+        lineno = 0
+        size = len(buffer)
+        while start < size:
+            lineno += 1
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                end = size
+            line = buffer[start:end]
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError as err:
+                    raise JsonLinesError(lineno, err) from err
+                if not isinstance(record, dict) or \
+                        not isinstance(record.get(KEY_FIELD), str):
+                    raise JsonLinesError(
+                        lineno, f"not an object with a string {KEY_FIELD!r}")
+                yield record[KEY_FIELD], start, end, record
+            start = end + 1
+
+    def join(self, files):
+        """Set the meta_record of the ImagePaths in *files* to their records.
+
+        Records are matched by the arg of each ImagePath. Files without a
+        record are left alone. If several records have the same key, the
+        last one is used. The records of *files* are kept as they were
+        decoded by scan(); the others are dropped.
+        """
+        by_arg = {}
+        for file in files:
+            by_arg.setdefault(file.arg, []).append(file)
+        for key, start, end, record in self.scan():
+            matches = by_arg.get(key)
+            if matches is None:
+                continue
+            meta_record = MetaRecord(self, start, end, record)
+            for file in matches:
+                file.meta_record = meta_record
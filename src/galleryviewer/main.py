@@ -1,23 +1,28 @@
-import argparse
 import collections
 import configparser
-import json
+import functools
+import io
 import logging
 import os
 import pathlib
 import re
+import stat
 import sys
-from contextlib import nullcontext
-from dataclasses import dataclass
-
-from jinja2 import (Environment, FileSystemLoader, PackageLoader, PrefixLoader,
-                    TemplateNotFound, select_autoescape)
+from contextlib import contextmanager, nullcontext
+from operator import attrgetter
 
 from . import _PROG, __version__
+from .timings import PhaseTimer, run_profiled
+
+# Modules that are slow to import, like jinja2, are imported by the functions
+# that need them, so that runs that render nothing don't pay for them.
 
 DEFAULT_TMPL_NAME = "default.html"
-OPTION_DEFAULTS = {"data_file": None,
+OPTION_DEFAULTS = {"cache": True,
+                   "data_file": None,
                    "ignore_case": True,
+                   "meta_file": None,
+                   "probe": False,
                    "profile": f"builtin/{DEFAULT_TMPL_NAME}",
                    "sort": "human",
                    "test": False}
@@ -27,16 +32,133 @@ EX_NOINPUT = 66
 EX_JSONERR = 100
 EX_NOTEMPLATE = 101
 EX_OUTPUT = 102
-
-
-@dataclass
+_NUMBER_RE = re.compile("([0-9]+)")
+# Sort methods by file status, and the stat_result attributes they sort by
+STAT_SORT_FIELDS = {"mtime": "st_mtime_ns",
+                    "ctime": "st_ctime_ns",
+                    "size": "st_size"}
+PATHS_CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = frozenset({".apng", ".avif", ".bmp", ".gif", ".ico", ".jpeg",
+                              ".jpg", ".jxl", ".png", ".svg", ".tif", ".tiff",
+                              ".webp"})
+EMIT_BUFFER_SIZE = 64 * 1024
+
+
+# pylint: disable-next=too-many-instance-attributes
 class ImagePath:
-    arg: str
-    index: int
+    # Not a dataclass, because importing dataclasses slows down startup.
+    # Galleries can hold millions of these, so they have no __dict__, and
+    # the directory part of arg is interned and shared with other paths.
+    __slots__ = ("_directory", "_name", "index", "sort_key", "info",
+                 "meta_record", "_path", "_src")
+
+    def __init__(self, arg, index, sort_key=None):
+        directory, slash, name = arg.rpartition("/")
+        self._directory = sys.intern(directory + slash) if slash else ""
+        self._name = name
+        self.index = index
+        self.sort_key = sort_key
+        # ImageInfo, set by probe_files()
+        self.info = None
+        # jsonlines.MetaRecord, set by load_meta_file()
+        self.meta_record = None
+        self._path = None
+        self._src = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(arg={self.arg!r}, index={self.index!r})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.arg, self.index) == (other.arg, other.index)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    @property
+    def arg(self):
+        return self._directory + self._name
 
     @property
     def path(self):
-        return pathlib.Path(self.arg)
+        if self._path is None:
+            self._path = pathlib.Path(self.arg)
+        return self._path
+
+    @property
+    def src(self):
+        """URL that templates load the image from: arg, unless replaced."""
+        return self.arg if self._src is None else self._src
+
+    @src.setter
+    def src(self, value):
+        self._src = value
+
+    @property
+    def embedded(self):
+        """True if src was replaced, such as by an embedded image."""
+        return self._src is not None
+
+    @property
+    def meta(self):
+        """Record of this file in the --meta-file, or None if it has none."""
+        if self.meta_record is None:
+            return None
+        return self.meta_record.load()
+
+
+class StatCache:
+    """Status of files, read once and shared by every stage that needs it.
+
+    Paths are relative to *directory*, if given.
+    """
+
+    def __init__(self, directory=None, max_workers=None):
+        self.directory = directory
+        self.max_workers = max_workers
+        self._stats = {}
+
+    def __contains__(self, path):
+        return path in self._stats
+
+    def update(self, paths):
+        """Read the status of those *paths* that aren't known yet.
+
+        The files of each directory are read together, and directories are
+        read concurrently.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        directories = collections.defaultdict(list)
+        for path in paths:
+            if path not in self._stats:
+                directories[os.path.dirname(path)].append(path)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, stats in zip(directories.values(),
+                                    executor.map(self._stat_batch,
+                                                 directories.values())):
+                self._stats.update(zip(batch, stats))
+
+    def get(self, path):
+        """Return the os.stat_result of *path*, or None if it doesn't exist."""
+        try:
+            return self._stats[path]
+        except KeyError:
+            result = self._stats[path] = self._stat_batch([path])[0]
+            return result
+
+    def set(self, path, stat_result):
+        """Record *stat_result*, the status of *path* read elsewhere."""
+        self._stats[path] = stat_result
+
+    def _stat_batch(self, paths):
+        results = []
+        for path in paths:
+            try:
+                results.append(os.stat(os.path.join(self.directory or "", path)))
+            except OSError:
+                results.append(None)
+        return results
 
 
 class Config:
@@ -162,87 +284,396 @@ def alphanum_key(string):
     >>> alphanum_key("z23a")
     ['z', 23, 'a']
     """
-    return [atoi(char) for char in re.split("([0-9]+)", string)]
+    return [atoi(char) for char in _NUMBER_RE.split(string)]
 
 
-def main(argv=None):
+def natural_key(string, _split=_NUMBER_RE.split):
+    """Turn a string into a key that sorts it in human order.
+
+    The key orders exactly like the chunk list of alphanum_key(), but it is
+    a single string, which is smaller and much faster to compare. Each run
+    of digits is replaced by a NUL character, the character whose code
+    point is the number of significant digits, and the significant digits.
+
+    >>> natural_key("z100a") > natural_key("z23a") > natural_key("z")
+    True
+    >>> natural_key("z007a") == natural_key("z7a")
+    True
+    """
+    chunks = _split(string)
+    chunks[1::2] = [f"\0{chr(len(digits))}{digits}"
+                    for digits in [chunk.lstrip("0") for chunk in chunks[1::2]]]
+    return "".join(chunks)
+
+
+def get_key_function(sort_method, caseless=True, stat_cache=None):
+    """Return a function that turns a path argument into its sort key.
+
+    Return None if *sort_method* is "none". The sort methods by file status
+    in STAT_SORT_FIELDS get the status from *stat_cache* (a StatCache), and
+    break ties by human order. Files that don't exist sort last.
+    """
+    if sort_method == "none":
+        return None
+    if sort_method in STAT_SORT_FIELDS:
+        field = STAT_SORT_FIELDS[sort_method]
+        name_key = get_key_function("human", caseless)
+        if stat_cache is None:
+            stat_cache = StatCache()
+
+        def stat_key(arg):
+            result = stat_cache.get(arg)
+            if result is None:
+                return (1, 0, name_key(arg))
+            return (0, getattr(result, field), name_key(arg))
+        return stat_key
+    if sort_method is None or sort_method == "default":
+        sort_method = "human"
+    if sort_method == "ascii":
+        return str.casefold if caseless else str
+    if sort_method == "human":
+        if caseless:
+            return lambda arg: natural_key(arg.casefold())
+        return natural_key
+    raise ValueError(sort_method)
+
+
+def main(argv=None, *, config=None):
+    """Run galleryviewer with the command-line arguments *argv*.
+
+    If *config* is given, it is used instead of reading the configuration
+    files. Return the exit status.
+    """
+    timer = PhaseTimer()
     logging.basicConfig(level=logging.INFO,
                         format=f"{_PROG}: %(levelname)s: %(message)s")
-    config = get_config()
-    config.read(generate_config_paths())
-    args = get_cla(config.options).parse_args(argv)
+    from .cli import check_args, get_cla
+
+    with timer.phase("config"):
+        if config is None:
+            config = load_config()
+        parser = get_cla(config.options)
+        args = parser.parse_args(argv)
+        check_args(args, parser)
+    if args.profile_out is None:
+        status = run(args, config, timer)
+    else:
+        status = run_profiled(args.profile_out, run, args, config, timer)
+    if args.timings:
+        timer.report(sys.stderr, status)
+    return status
 
-    files = create_paths(args.paths, sort_method=args.sort, caseless=args.ignore_case)
+
+def run(args, config, timer):
+    """Render the document requested by the parsed arguments *args*.
+
+    The arguments must have been checked by cli.check_args().
+    """
+    if args.daemon:
+        from .client import default_socket_path
+        from .daemon import serve_daemon
+
+        return serve_daemon(args.socket or default_socket_path())
+    if args.recursive is not None:
+        from .batch import render_recursive
+
+        with timer.phase("render"):
+            return render_recursive(args, config)
+    if args.serve:
+        from .server import DEFAULT_PORT, serve
+
+        return serve(args, config.profiles.items(),
+                     DEFAULT_PORT if args.port is None else args.port)
+    if args.watch:
+        from .watch import watch
+
+        env = shared_environment(config.profiles.items(),
+                                 minify=args.minify, cache=args.cache)
+        return watch(args, env, args.title or pathlib.Path.cwd().name)
+    return render_document(args, config, timer)
+
+
+def render_document(args, config, timer):
+    """Render the document of the paths given by the parsed arguments *args*.
+
+    Return the exit status.
+    """
+    stat_cache = StatCache()
+    try:
+        with timer.phase("paths"):
+            files = create_paths(
+                iter_path_args(args, stat_cache), sort_method=args.sort,
+                caseless=args.ignore_case, stat_cache=stat_cache)
+    except _FatalError as err:
+        return err.status
     if args.check_sort:
         check_sort(files, args.sort)
         return EX_OK
-    if args.test and not test_paths(files):
-        return EX_TESTFAIL
+    if args.test:
+        with timer.phase("test"):
+            passed = test_paths(files, stat_cache=stat_cache)
+        if not passed:
+            return EX_TESTFAIL
+    if args.probe:
+        with timer.phase("probe"):
+            probe_files(files, cache=args.cache, stat_cache=stat_cache)
+    embedder = None
+    if args.embed:
+        from .embed import embed_files
+
+        with timer.phase("embed"):
+            embedder = embed_files(files, max_size=args.embed_max_size,
+                                   stat_cache=stat_cache)
+
+    with timer.phase("environment"):
+        env = shared_environment(config.profiles.items(),
+                                 minify=args.minify, cache=args.cache)
+    return _render_files(args, env, files,
+                         title=args.title or pathlib.Path.cwd().name,
+                         timer=timer, embedder=embedder)
+
+
+# pylint: disable-next=too-many-arguments
+def _render_files(args, env, files, *, title, timer, embedder):
+    if len(args.outputs) > 1:
+        from .outputs import render_outputs
+
+        return render_outputs(args, env, files, title=title, timer=timer,
+                              embedder=embedder)
+    manifest = fingerprint = None
+    if args.incremental:
+        from .manifest import Manifest, compute_fingerprint, fingerprint_options
+
+        with timer.phase("fingerprint"):
+            manifest = Manifest(args.output)
+            fingerprint = compute_fingerprint(
+                env, files, profile=args.profile, template_file=args.template,
+                data_file=args.data_file, meta_file=args.meta_file,
+                options=fingerprint_options(args, title))
+        if manifest.is_current(fingerprint):
+            logging.info("%s is up to date", args.output)
+            return EX_OK
 
     try:
-        data = load_data_file(file=args.data_file)
+        data, meta_index = load_inputs(args, files, timer)
     except _FatalError as err:
         return err.status
+    with meta_index:
+        return render(args, env, files, data, title=title, timer=timer,
+                      manifest=manifest, fingerprint=fingerprint,
+                      embedder=embedder)
 
-    env = get_environment(config.profiles.items())
+
+# pylint: disable-next=too-many-arguments
+def render(args, env, files, data, *, title, timer, manifest=None,
+           fingerprint=None, embedder=None):
+    """Render *files* into the output chosen by *args*."""
     try:
-        template = load_template(env, name=args.profile, file=args.template)
+        with timer.phase("template"):
+            template = load_template(env, name=args.profile, file=args.template)
     except _FatalError as err:
         return err.status
 
     substitutions = {
-        "title": args.title or pathlib.Path.cwd().name,
+        "title": title,
         "files": files,
-        "data": data
+        "data": data,
+        "pagination": None
     }
+    # Rendering is streamed to the output, so writing is part of this phase
+    if args.output_dir is not None:
+        try:
+            with timer.phase("render"):
+                from .pages import write_pages
+
+                write_pages(args.output_dir, env, template, substitutions,
+                            page_size=args.page_size, precompress=args.precompress)
+        except _FatalError as err:
+            return err.status
+        return EX_OK
     try:
-        with file_or_standard_stream(args.output, 'w', encoding="UTF-8") as outfile:
-            emit(outfile, template, substitutions)
+        if args.incremental:
+            output_stream = replace_atomically(args.output, if_changed=True)
+        else:
+            output_stream = file_or_standard_stream(args.output, 'w',
+                                                    encoding="UTF-8")
+        with timer.phase("render"), output_stream as outfile:
+            emit(outfile, template, substitutions,
+                 compressed_path=args.output if args.precompress else None,
+                 embedder=embedder)
     except OSError as err:
         logging.error("unable to write to output: %s", err)
         return EX_OUTPUT
+    if manifest is not None and fingerprint is not None:
+        manifest.save(fingerprint)
     return EX_OK
 
 
 def file_or_standard_stream(file_arg, mode, encoding="UTF-8", **open_kwargs):
     if file_arg is None or file_arg == '-':
         if 'r' in mode:
-            return nullcontext(sys.stdin)
+            return _reopened_stdin(encoding, **open_kwargs)
         if 'w' in mode:
             return nullcontext(sys.stdout)
     return open(file_arg, mode, encoding=encoding, **open_kwargs)
 
 
+@contextmanager
+def _reopened_stdin(encoding, errors=None, newline=None):
+    """Read standard input as text like open() reads a file.
+
+    Its bytes are decoded with *encoding*, *errors* and *newline*, which
+    sys.stdin doesn't take. Standard input is left open.
+    """
+    stream = io.TextIOWrapper(sys.stdin.buffer, encoding=encoding,
+                              errors=errors, newline=newline)
+    try:
+        yield stream
+    finally:
+        stream.detach()
+
+
+@contextmanager
+def replace_atomically(path, encoding="UTF-8", *, binary=False,
+                       if_changed=False):
+    """Open a temporary file for writing that will replace *path* on success.
+
+    The file is opened in binary mode if *binary* is true, or else as text
+    in *encoding*. If *if_changed* is true and the file written has the
+    same contents as *path*, *path* is left untouched, keeping its
+    modification time. Otherwise it is replaced atomically, keeping its
+    permissions if it exists. If the block raises an exception, the
+    temporary file is removed and *path* is left alone.
+    """
+    import filecmp
+
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with (open(fd, 'wb') if binary
+              else open(fd, 'w', encoding=encoding)) as file:
+            yield file
+        try:
+            old_stat = os.stat(path)
+        except FileNotFoundError:
+            old_stat = None
+        if if_changed and old_stat is not None \
+                and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
+            return
+        if old_stat is not None:
+            os.chmod(tmp_path, old_stat.st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_paths(file, delimiter="\n", chunk_size=PATHS_CHUNK_SIZE):
+    """Yield path arguments from *file* as they are split on *delimiter*.
+
+    The file is read in chunks of *chunk_size* characters, so arbitrarily
+    long lists never need to be held in memory at once. Empty entries are
+    skipped.
+
+    >>> import io
+    >>> list(read_paths(io.StringIO("one.jpg\\0\\0two.jpg\\0"), "\\0", 3))
+    ['one.jpg', 'two.jpg']
+    """
+    pending = ""
+    for chunk in iter(lambda: file.read(chunk_size), ""):
+        *complete, pending = (pending + chunk).split(delimiter)
+        yield from filter(None, complete)
+    if pending:
+        yield pending
+
+
+def generate_path_args(paths, file=None, delimiter="\n"):
+    """Yield *paths*, followed by those read from *file* if it is not None."""
+    yield from paths
+    if file is None:
+        return
+    # Don't translate newlines inside NUL-delimited file names
+    newline = "" if delimiter == "\0" else None
+    with file_or_standard_stream(file, 'r', errors="surrogateescape",
+                                 newline=newline) as pathsfile:
+        yield from read_paths(pathsfile, delimiter)
+
+
+def iter_path_args(args, stat_cache=None):
+    """Yield the path arguments of the parsed command-line arguments *args*.
+
+    These are PATHS, those read from --files-from, and those found by
+    --scan. When sorting by file status, the status of the files found by
+    --scan is read into *stat_cache*. Raise _FatalError if the paths can't
+    be read.
+    """
+    delimiter = "\0" if args.null else "\n"
+    try:
+        yield from generate_path_args(args.paths, args.files_from, delimiter)
+    except OSError as err:
+        logging.error("unable to read paths file: %s", err)
+        raise _FatalError(EX_NOINPUT) from err
+    if not args.scan:
+        return
+    from .scan import scan_directories
+
+    if args.sort not in STAT_SORT_FIELDS:
+        stat_cache = None
+    yield from scan_directories(args.scan, include=args.include,
+                                exclude=args.exclude, max_depth=args.max_depth,
+                                stat_cache=stat_cache)
+
+
+def is_image_name(name):
+    """Return True if the file *name* has an image file extension.
+
+    >>> is_image_name("IMG_0001.JPG"), is_image_name("index.html")
+    (True, False)
+    """
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
 def get_config():
     """Build and return config parser."""
     parser = configparser.ConfigParser(interpolation=None)
     config = Config(parser)
     config.add_rule("sort",
-                    choices={"none", "ascii", "human", "default"})
+                    choices={"none", "ascii", "human", "default",
+                             *STAT_SORT_FIELDS})
     config.add_rule("case", dest="ignore_case",
                     actions={"ignore": True, "consider": False})
     config.add_rule("test", converter="boolean")
+    config.add_rule("cache", converter="boolean")
+    config.add_rule("probe", converter="boolean")
     config.add_rule("data_file", "datafile", "data-file")
+    config.add_rule("meta_file", "metafile", "meta-file")
     config.add_rule("profile")
     config.options = collections.ChainMap(config.options, OPTION_DEFAULTS)
     return config
 
 
-def create_paths(paths, sort_method=None, *, caseless=True):
-    """Create and return a sorted list of ImagePaths."""
-    files = [ImagePath(arg, ind) for ind, arg in enumerate(paths)]
-    if sort_method == "none":
-        return files
-    if sort_method is None or sort_method == "default":
-        sort_method = "human"
-    str_func = str.casefold if caseless else str
-    if sort_method == "ascii":
-        key_func = str
-    elif sort_method == "human":
-        key_func = alphanum_key
-    else:
-        raise ValueError(sort_method)
-    files.sort(key=lambda p: key_func(str_func(p.arg)))
+def create_paths(paths, sort_method=None, *, caseless=True, stat_cache=None):
+    """Create and return a sorted list of ImagePaths.
+
+    Each ImagePath keeps the sort key computed for it in its sort_key
+    attribute. Sorting by file status reads the status of all paths into
+    *stat_cache* (a StatCache), if given.
+    """
+    if sort_method in STAT_SORT_FIELDS:
+        paths = list(paths)
+        if stat_cache is None:
+            stat_cache = StatCache()
+        stat_cache.update(paths)
+    key_func = get_key_function(sort_method, caseless, stat_cache)
+    if key_func is None:
+        return [ImagePath(arg, ind) for ind, arg in enumerate(paths)]
+    files = [ImagePath(arg, ind, key_func(arg)) for ind, arg in enumerate(paths)]
+    files.sort(key=attrgetter("sort_key"))
     return files
 
 
@@ -252,19 +683,95 @@ def check_sort(files, sort_method=None):
         print(file.arg)
 
 
-def test_paths(files):
-    """If not all paths in *files* exist, emit an error and return False."""
-    for file in files:
-        if not file.path.is_file():
-            logging.error(
-                "path %s does not exist or is not a regular file", file.path)
-            return False
-    return True
+def test_paths(files, max_workers=None, stat_cache=None):
+    """If not all paths in *files* exist, emit errors and return False.
+
+    Every missing path is reported, not just the first. If *stat_cache*
+    already holds the status of every path, the file system isn't read
+    again.
+    """
+    if stat_cache is not None and all(file.arg in stat_cache for file in files):
+        missing = [file for file in files
+                   if not _is_regular_file(stat_cache.get(file.arg))]
+    else:
+        missing = find_missing_paths(files, max_workers=max_workers)
+    for file in missing:
+        logging.error(
+            "path %s does not exist or is not a regular file", file.arg)
+    if missing:
+        logging.error("%d of %d paths failed the test", len(missing), len(files))
+    return not missing
+
+
+def _is_regular_file(stat_result):
+    return stat_result is not None and stat.S_ISREG(stat_result.st_mode)
+
+
+def list_regular_files(directory):
+    """Return the set of names of regular files in *directory*.
+
+    Symbolic links are followed. Return an empty set if *directory* cannot
+    be listed.
+    """
+    try:
+        with os.scandir(directory or os.curdir) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except OSError:
+        return set()
+
+
+def find_missing_paths(files, max_workers=None):
+    """Return a list of the ImagePaths in *files* that aren't regular files.
+
+    Each directory is listed once, and directories are listed concurrently
+    by up to *max_workers* threads. Paths whose names aren't found in the
+    listing of their directory (like those with a different letter case on
+    a case-insensitive file system) are checked again individually.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    split_args = [os.path.split(file.arg) for file in files]
+    directories = list(dict.fromkeys(directory for directory, _ in split_args))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        listings = dict(zip(directories,
+                            executor.map(list_regular_files, directories)))
+    return [file for file, (directory, name) in zip(files, split_args)
+            if name not in listings[directory] and not os.path.isfile(file.arg)]
+
+
+def probe_files(files, cache=True, directory=None, stat_cache=None):
+    """Set the info attribute of ImagePaths in *files* from the image headers.
+
+    If *cache* is true, results are cached on disk. Paths are relative to
+    *directory*, if given. File status is shared through *stat_cache*.
+    """
+    from .imageinfo import ImageInfoCache, probe_images
+
+    info_cache = ImageInfoCache() if cache else None
+    try:
+        probe_images(files, cache=info_cache, directory=directory,
+                     stat_cache=stat_cache)
+    finally:
+        if info_cache is not None:
+            info_cache.close()
+
+
+def load_inputs(args, files, timer):
+    """Return the data and the metadata index of the ImagePaths *files*.
+
+    They are loaded from the files given by the parsed arguments *args*,
+    see load_data_file() and load_meta_file().
+    """
+    with timer.phase("data"):
+        return (load_data_file(file=args.data_file),
+                load_meta_file(files, file=args.meta_file))
 
 
 def load_data_file(file=None):
     if file is None:
         return {}
+    import json
+
     try:
         with open(file, encoding="UTF-8") as jsonfile:
             return json.load(jsonfile)
@@ -276,6 +783,31 @@ def load_data_file(file=None):
         raise _FatalError(EX_NOINPUT) from err
 
 
+def load_meta_file(files, file=None):
+    """Join the records of the JSON Lines *file* onto the ImagePaths in *files*.
+
+    Return the jsonlines.JsonLinesIndex that the records are read from,
+    which must be closed when they are no longer needed, or a null context
+    if *file* is None.
+    """
+    if file is None:
+        return nullcontext()
+    from .jsonlines import JsonLinesError, JsonLinesIndex
+
+    try:
+        index = JsonLinesIndex(open(file, 'rb'))  # pylint: disable=consider-using-with
+    except OSError as err:
+        logging.error("unable to open metadata file: %s", err)
+        raise _FatalError(EX_NOINPUT) from err
+    try:
+        index.join(files)
+    except JsonLinesError as err:
+        index.close()
+        logging.error("unable to decode %s as JSON Lines: %s", file, err)
+        raise _FatalError(EX_JSONERR) from err
+    return index
+
+
 def generate_config_paths():
     yield pathlib.Path("/etc", f"{_PROG}.conf")
     yield from sorted(pathlib.Path("/etc", f"{_PROG}.conf.d").glob("*.conf"))
@@ -289,6 +821,48 @@ def generate_config_paths():
     yield from sorted(pathlib.Path(user_config_dir, "config.d").glob("*.conf"))
 
 
+def load_config():
+    """Read and return the configuration of the configuration files."""
+    config = get_config()
+    config.read(generate_config_paths())
+    return config
+
+
+def get_cache_dir():
+    """Return the path of the user cache directory."""
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME")
+    if xdg_cache_home:
+        return pathlib.Path(xdg_cache_home, _PROG)
+    home = os.getenv("HOME") or pathlib.Path.home()
+    return pathlib.Path(home, ".cache", _PROG)
+
+
+def get_bytecode_cache(directory=None):
+    """Return a cache for compiled templates, stored in *directory*.
+
+    The default directory is under get_cache_dir(). Cached templates are
+    checked against their source, and the versions of the program and of
+    Jinja are part of the cache file names. Return None, after emitting a
+    warning, if the directory is not usable.
+    """
+    if directory is None:
+        directory = get_cache_dir() / "bytecode"
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError as err:
+        logging.warning("not caching templates: %s", err)
+        return None
+    if not os.access(directory, os.W_OK | os.X_OK):
+        logging.warning("not caching templates: directory %s is not writable",
+                        directory)
+        return None
+    import jinja2
+
+    jinja_version = getattr(jinja2, "__version__", "")
+    pattern = f"{_PROG}-{__version__}-jinja2-{jinja_version}-%s.cache"
+    return jinja2.FileSystemBytecodeCache(os.fspath(directory), pattern=pattern)
+
+
 def add_default_suffix(arg):
     """Convert arg into a prefixed template name."""
     if '/' not in arg:
@@ -297,27 +871,73 @@ def add_default_suffix(arg):
     return arg
 
 
-def get_environment(prefixes, **env_kwargs):
+def get_environment(prefixes, minify=False, **env_kwargs):
+    """Return the Environment of the profiles in (profile, path) *prefixes*.
+
+    If *minify* is true, CSS and JavaScript templates are minified as they
+    are loaded (see minify.MinifyingLoader).
+    """
+    from jinja2 import (Environment, FileSystemLoader, PackageLoader,
+                        PrefixLoader, select_autoescape)
+
     mapping = {profile: FileSystemLoader(path)
                for profile, path in prefixes}
     mapping["builtin"] = PackageLoader(_PROG)
     loader = PrefixLoader(mapping)
-    return Environment(loader=loader,
-                       autoescape=select_autoescape({"html", "htm", "jinja"}),
-                       trim_blocks=True,
-                       lstrip_blocks=True,
-                       keep_trailing_newline=True,
-                       **env_kwargs)
+    if minify:
+        from .minify import MinifyingLoader
+
+        loader = MinifyingLoader(loader)
+    env = Environment(loader=loader,
+                      autoescape=select_autoescape({"html", "htm", "jinja"}),
+                      trim_blocks=True,
+                      lstrip_blocks=True,
+                      keep_trailing_newline=True,
+                      **env_kwargs)
+    # Compact output of the tojson filter
+    env.policies["json.dumps_kwargs"] = {"sort_keys": True,
+                                         "separators": (",", ":")}
+    return env
+
+
+def shared_environment(profiles, *, minify=False, cache=True):
+    """Return the Environment of the (profile, path) pairs *profiles*.
+
+    The environment, with the templates it has compiled, is shared by every
+    call with the same arguments, such as the requests of a daemon. If
+    *cache* is true, compiled templates are also cached on disk (see
+    get_bytecode_cache).
+    """
+    directory = get_cache_dir() / "bytecode" if cache else None
+    return _shared_environment(tuple(profiles), minify, directory)
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_environment(profiles, minify, bytecode_directory):
+    bytecode_cache = None
+    if bytecode_directory is not None:
+        bytecode_cache = get_bytecode_cache(bytecode_directory)
+    return get_environment(profiles, minify=minify, bytecode_cache=bytecode_cache)
+
+
+def read_template_source(file):
+    """Return the source of the template *file* ('-' for stdin).
+
+    Raise _FatalError if it can't be read.
+    """
+    try:
+        with file_or_standard_stream(file, 'r', encoding=None) as templatefile:
+            return templatefile.read()
+    except OSError as err:
+        logging.error("unable to read template file: %s", err)
+        raise _FatalError(EX_NOINPUT) from err
 
 
 def load_template(env, name, file=None):
+    from jinja2 import TemplateNotFound
+
     if file is not None:
-        try:
-            with file_or_standard_stream(file, 'r', encoding=None) as templatefile:
-                return env.from_string(templatefile.read())
-        except OSError as err:
-            logging.error("unable to read template file: %s", err)
-            raise _FatalError(EX_NOINPUT) from err
+        return from_string_cached(env, read_template_source(file))
     try:
         return env.get_template(name)
     except TemplateNotFound as err:
@@ -325,68 +945,53 @@ def load_template(env, name, file=None):
         raise _FatalError(EX_NOTEMPLATE) from err
 
 
-def emit(outfile, template, context):
-    document = template.render(context)
-    outfile.write(document)
-
-
-def get_cla(defaults):
-    """Build and return parser for command-line arguments."""
-    # If defaults does not contain all needed argument defaults, raise
-    # KeyError. This is just easier to debug than providing another layer of
-    # get defaults.
-    parser = argparse.ArgumentParser(
-        prog=_PROG, description="Create an HTML viewer for images")
-    parser.add_argument(
-        "paths", nargs="+", metavar="PATHS",
-        help="image file paths to include in viewer")
-    parser.add_argument(
-        "-V", "--version", action="version",
-        version=f"%(prog)s {__version__}")
-    sorting = parser.add_argument_group("sorting options")
-    sorting.add_argument(
-        "-n", "--check-sort", action="store_true",
-        help="print PATHS in chosen sorting order; don't emit HTML")
-    case = sorting.add_mutually_exclusive_group()
-    case.add_argument(
-        "-c", "--consider-case", action="store_false", dest="ignore_case",
-        default=defaults["ignore_case"],
-        help="consider letter case when sorting PATHS")
-    case.add_argument(
-        "-f", "--ignore-case", action="store_true",
-        default=defaults["ignore_case"],
-        help="casefold PATHS when sorting")
-    sort_method = sorting.add_mutually_exclusive_group()
-    sort_method.add_argument(
-        "--sort", type=str.lower,
-        choices=["none", "ascii", "human"], default=defaults["sort"],
-        help="sorting method to apply to PATHS: none (-U), ascii or "
-             "lexicographic, human or natural order (default)")
-    sort_method.add_argument(
-        "-U", "--no-sort", action="store_const", const="none", dest="sort",
-        help="include PATHS in the order passed without sorting")
-    parser.add_argument(
-        "-d", "--data-file", metavar="FILE", default=defaults["data_file"],
-        help="load data from %(metavar)s in JSON format")
-    parser.add_argument(
-        "-o", "--output", metavar="FILE",
-        help="place output into %(metavar)s (default is stdout)")
-    parser.add_argument(
-        "-p", "--profile",
-        default=defaults["profile"], type=add_default_suffix,
-        help="use PROFILE instead of %(default)s")
-    parser.add_argument(
-        "-t", "--template", metavar="FILE",
-        help="load template directly from %(metavar)s")
-    testing = parser.add_mutually_exclusive_group()
-    testing.add_argument(
-        "--test", action="store_true", default=defaults["test"],
-        help="exit if not all PATHS exist as files")
-    testing.add_argument(
-        "--no-test", action="store_false",
-        dest="test", default=defaults["test"],
-        help="don't test PATHS for existence")
-    parser.add_argument(
-        "-T", "--title",
-        help="custom title (default is current directory name)")
-    return parser
+def from_string_cached(env, source):
+    """Load a template from *source* like env.from_string().
+
+    If *env* has a bytecode cache, the compiled template is looked up in it
+    by a hash of *source*, and stored there after compiling if missing.
+    """
+    cache = env.bytecode_cache
+    if cache is None:
+        return env.from_string(source)
+    import hashlib
+
+    name = hashlib.sha256(source.encode("UTF-8", "surrogateescape")).hexdigest()
+    bucket = cache.get_bucket(env, name, None, source)
+    if bucket.code is None:
+        bucket.code = env.compile(source)
+        cache.set_bucket(bucket)
+    return env.template_class.from_code(env, bucket.code, env.make_globals(None))
+
+
+# pylint: disable-next=too-many-arguments
+def emit(outfile, template, context, buffer_size=EMIT_BUFFER_SIZE, *,
+         compressed_path=None, embedder=None):
+    """Render *template* with *context* and stream it to *outfile*.
+
+    The document is never held in memory as a whole. Rendered pieces are
+    collected into writes of about *buffer_size* characters. If
+    *compressed_path* is given, compressed copies of the document are
+    written next to it as well (see compress.precompressed). If *embedder*
+    (an embed.Embedder) is given, the images it embeds are written into the
+    document.
+    """
+    if compressed_path is not None:
+        from .compress import precompressed
+
+        with precompressed(outfile, compressed_path) as stream:
+            emit(stream, template, context, buffer_size, embedder=embedder)
+        return
+    chunks = template.generate(context)
+    if embedder is not None:
+        chunks = embedder.expand(chunks)
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            outfile.write("".join(buffer))
+            buffer.clear()
+            buffered = 0
+    outfile.write("".join(buffer))
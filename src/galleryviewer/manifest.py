@@ -0,0 +1,237 @@
+"""Build manifests, to skip rendering when no inputs have changed."""
+
+import hashlib
+import json
+import logging
+import os
+
+from . import __version__
+from .main import get_cache_dir, replace_atomically
+
+TEMPLATE_FILE_NAME = "<template>"
+_READ_SIZE = 64 * 1024
+
+
+class Manifest:
+    """Record of the inputs that the document at *output* was built from.
+
+    Manifests are stored in *directory* (by default, under the user cache
+    directory), in a file named after a hash of the absolute path of the
+    output.
+    """
+
+    def __init__(self, output, directory=None):
+        self.output = os.path.abspath(output)
+        if directory is None:
+            directory = get_cache_dir() / "manifests"
+        digest = hashlib.sha256(os.fsencode(self.output)).hexdigest()
+        self.path = os.path.join(directory, f"{digest}.json")
+
+    def _output_state(self):
+        try:
+            stat = os.stat(self.output)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_current(self, fingerprint):
+        """Return True if the output was built from inputs with *fingerprint*.
+
+        The output must also not have been modified since it was built.
+        """
+        if fingerprint is None:
+            return False
+        try:
+            with open(self.path, encoding="UTF-8") as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return False
+        return (isinstance(record, dict)
+                and record.get("output") == self.output
+                and record.get("fingerprint") == fingerprint
+                and record.get("state") == self._output_state())
+
+    def save(self, fingerprint):
+        """Record that the output was just built from inputs with *fingerprint*.
+
+        If the manifest can't be written, emit a warning.
+        """
+        record = {"output": self.output,
+                  "fingerprint": fingerprint,
+                  "state": self._output_state()}
+        try:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            with replace_atomically(self.path) as file:
+                json.dump(record, file)
+        except OSError as err:
+            logging.warning("unable to save build manifest: %s", err)
+
+
+def _unchanged():
+    return True
+
+
+def _changed():
+    return False
+
+
+class InputCache:
+    """Inputs of fingerprints, kept for as long as they are unchanged.
+
+    A process that fingerprints the same inputs again and again, like the
+    server, passes one to compute_fingerprint(). Files are read again only
+    when their status changes, and templates when their loader reports
+    them as changed.
+    """
+
+    def __init__(self):
+        # (status, value) by path and function
+        self._files = {}
+        # (uptodate function, source, references) by template name
+        self._templates = {}
+
+    def load_file(self, path, load):
+        """Return load(*path*), or its result from when the file was the same."""
+        stat = os.stat(path)
+        status = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached = self._files.get((path, load))
+        if cached is None or cached[0] != status:
+            cached = self._files[path, load] = (status, load(path))
+        return cached[1]
+
+    def template(self, env, name, source=None):
+        """Return the (source, referenced names) of template *name* of *env*.
+
+        If *source* is given, it is used instead of loading it from *env*.
+        """
+        cached = self._templates.get(name)
+        if source is None:
+            if cached is not None and cached[0]():
+                return cached[1], cached[2]
+            source, _, uptodate = env.loader.get_source(env, name)
+            if uptodate is None:
+                # Like jinja2, take the template as never changing
+                uptodate = _unchanged
+        else:
+            if cached is not None and cached[1] == source:
+                return cached[1], cached[2]
+            # Given sources are compared instead
+            uptodate = _changed
+        references = referenced_templates(env, source)
+        self._templates[name] = (uptodate, source, references)
+        return source, references
+
+
+def referenced_templates(env, source):
+    """Return the names of the templates referenced by template *source*."""
+    from jinja2 import meta
+
+    return [reference
+            for reference in meta.find_referenced_templates(env.parse(source))
+            if reference is not None]
+
+
+def template_sources(env, name, source=None, cache=None):
+    """Return a dict of the sources of template *name* and its references.
+
+    If *source* is given, it is used as the source of *name* instead of
+    loading it from *env*. Referenced templates (by extends, include and
+    import tags with constant names) are loaded recursively, from the
+    InputCache *cache* if given. Raise jinja2.TemplateNotFound if any
+    template cannot be found.
+    """
+    sources = {}
+    pending = [(name, source)]
+    while pending:
+        name, source = pending.pop()
+        if cache is not None:
+            source, references = cache.template(env, name, source)
+        else:
+            if source is None:
+                source, _, _ = env.loader.get_source(env, name)
+            references = referenced_templates(env, source)
+        sources[name] = source
+        for reference in references:
+            if reference not in sources:
+                pending.append((reference, None))
+    return sources
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of the contents of the file at *path*."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(_READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_text(path):
+    with open(path, encoding="UTF-8") as file:
+        return file.read()
+
+
+def fingerprint_options(args, title):
+    """Return the options of the parsed arguments *args* that shape documents.
+
+    They are passed to compute_fingerprint(), with the *title* given to
+    templates.
+    """
+    return {"title": title, "sort": args.sort, "ignore_case": args.ignore_case,
+            "probe": args.probe, "minify": args.minify,
+            "precompress": args.precompress}
+
+
+def _load_file(path, load, cache):
+    if path is None:
+        return None
+    return load(path) if cache is None else cache.load_file(path, load)
+
+
+# pylint: disable-next=too-many-arguments
+def compute_fingerprint(env, files, *, profile, template_file=None,
+                        data_file=None, meta_file=None, options=None,
+                        cache=None):
+    """Return a fingerprint of all the inputs of a document.
+
+    The inputs are the ImagePaths *files* in order, with their info if they
+    were probed, the template (either *profile* or the contents of
+    *template_file*) with all the templates it references, the contents of
+    *data_file* and *meta_file*, and *options*, a mapping of further
+    JSON-serializable values like the sort method and title. Inputs that
+    haven't changed since they were last read are taken from the InputCache
+    *cache*, if given.
+
+    Return None if any input can't be read; rendering the document will
+    then report the error.
+    """
+    from jinja2 import TemplateError
+
+    if template_file == '-':
+        # Standard input can't be read again for rendering
+        return None
+    try:
+        if template_file is None:
+            sources = template_sources(env, profile, cache=cache)
+        else:
+            sources = template_sources(env, TEMPLATE_FILE_NAME,
+                                       _load_file(template_file, read_text, cache),
+                                       cache=cache)
+        data_digest = _load_file(data_file, file_digest, cache)
+        meta_digest = _load_file(meta_file, file_digest, cache)
+    except (OSError, UnicodeDecodeError, TemplateError):
+        return None
+    digest = hashlib.sha256()
+    header = {"version": __version__,
+              "templates": sources,
+              "data": data_digest,
+              "meta": meta_digest,
+              "options": options or {}}
+    digest.update(json.dumps(header, sort_keys=True).encode("UTF-8"))
+    for file in files:
+        digest.update(file.arg.encode("UTF-8", "surrogateescape"))
+        digest.update(b"\0")
+        if file.info is not None:
+            digest.update(repr(file.info.astuple()).encode("UTF-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -0,0 +1,62 @@
+"""Minify the CSS and JavaScript sources of templates as they are loaded."""
+
+import posixpath
+import re
+
+from jinja2 import BaseLoader
+
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_SPACE_RE = re.compile(r"\s+")
+_CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+
+
+def minify_css(source):
+    """Strip comments and the whitespace that doesn't matter from CSS *source*.
+
+    >>> minify_css("a, b > c {\\n  color: red; /* Note */\\n}\\n")
+    'a,b>c{color:red}'
+    """
+    source = _CSS_COMMENT_RE.sub("", source)
+    source = _CSS_SPACE_RE.sub(" ", source)
+    source = _CSS_PUNCTUATION_RE.sub(r"\1", source)
+    return source.replace(": ", ":").replace(";}", "}").strip()
+
+
+def minify_js(source):
+    """Strip indentation, blank lines and whole-line comments from JS *source*.
+
+    Line breaks are kept, so that automatic semicolon insertion is not
+    affected, and nothing within a line is changed. Multi-line template
+    literals lose their indentation.
+
+    >>> minify_js("// Comment\\nfunction f() {\\n    return 1;  \\n}\\n\\n")
+    'function f() {\\nreturn 1;\\n}\\n'
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return "".join(f"{line}\n" for line in lines
+                   if line and not line.startswith("//"))
+
+
+# Minifiers by the file name extension of templates
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+class MinifyingLoader(BaseLoader):
+    """Load templates from *loader*, minifying those with a known extension.
+
+    Sources are minified before they are compiled, so the compiled
+    templates (and the bytecode cache) hold the minified text.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = self.loader.get_source(environment, template)
+        minifier = MINIFIERS.get(posixpath.splitext(template)[1])
+        if minifier is not None:
+            source = minifier(source)
+        return source, filename, uptodate
+
+    def list_templates(self):
+        return self.loader.list_templates()
@@ -0,0 +1,159 @@
+"""Render the same files into several outputs, each with its own profile."""
+
+import logging
+import os
+
+from .main import (EX_OK, EX_OUTPUT, _FatalError, emit, load_inputs,
+                   load_template, replace_atomically)
+from .workers import current_renderer, process_renderer
+
+
+# pylint: disable-next=too-few-public-methods
+class OutputRenderer:
+    """Render one template context into several outputs.
+
+    *targets* are (template, output path) pairs. Outputs are referred to by
+    their index in *targets*, so that forked processes can render them
+    without the templates being pickled.
+    """
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, context, targets, *, incremental=False, precompress=False,
+                 embedder=None):
+        self.context = context
+        self.targets = targets
+        self.incremental = incremental
+        self.precompress = precompress
+        self.embedder = embedder
+
+    def render(self, index):
+        """Render the output of target *index*.
+
+        Return None on success, or a message describing why the output could
+        not be written.
+        """
+        template, output = self.targets[index]
+        try:
+            if self.incremental:
+                output_stream = replace_atomically(output, if_changed=True)
+            else:
+                output_stream = open(output, 'w', encoding="UTF-8")
+            with output_stream as outfile:
+                emit(outfile, template, self.context,
+                     compressed_path=output if self.precompress else None,
+                     embedder=self.embedder)
+        except OSError as err:
+            return str(err)
+        return None
+
+
+def render_output(index):
+    """Render target *index* with the process renderer."""
+    return current_renderer().render(index)
+
+
+def _can_fork():
+    import multiprocessing
+
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def map_outputs(renderer, jobs=None):
+    """Render every target of *renderer*, and return the results in order.
+
+    Outputs are rendered by up to *jobs* processes (default: one per CPU)
+    forked from this one, which share the files and data of the context
+    without copying them. Where processes can't be forked, outputs are
+    rendered one after another.
+    """
+    tasks = range(len(renderer.targets))
+    workers = min(len(tasks), jobs or os.cpu_count() or 1)
+    with process_renderer(renderer):
+        if workers <= 1 or not _can_fork():
+            return list(map(render_output, tasks))
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork")) as executor:
+            return list(executor.map(render_output, tasks))
+
+
+# pylint: disable-next=too-many-arguments
+def _render_targets(args, env, files, targets, *, title, timer, embedder):
+    """Render *files* into the (profile, output) *targets*.
+
+    Return the results of map_outputs(). Raise _FatalError if the inputs
+    can't be loaded.
+    """
+    data, meta_index = load_inputs(args, files, timer)
+    with meta_index:
+        with timer.phase("template"):
+            templates = [load_template(env, name=profile)
+                         for profile, _ in targets]
+        context = {"title": title, "files": files, "data": data,
+                   "pagination": None}
+        renderer = OutputRenderer(
+            context, [(template, output) for template, (_, output)
+                      in zip(templates, targets)],
+            incremental=args.incremental, precompress=args.precompress,
+            embedder=embedder)
+        with timer.phase("render"):
+            return map_outputs(renderer, jobs=args.jobs)
+
+
+def _stale_fingerprints(args, env, files, targets, title):
+    """Return the fingerprints of the outputs of *targets* that are stale.
+
+    They are (Manifest, fingerprint) pairs by output, for the outputs whose
+    inputs changed since they were last rendered.
+    """
+    from .manifest import Manifest, compute_fingerprint, fingerprint_options
+
+    options = fingerprint_options(args, title)
+    fingerprints = {}
+    for profile, output in targets:
+        manifest = Manifest(output)
+        fingerprint = compute_fingerprint(
+            env, files, profile=profile, data_file=args.data_file,
+            meta_file=args.meta_file, options=options)
+        if manifest.is_current(fingerprint):
+            logging.info("%s is up to date", output)
+        else:
+            fingerprints[output] = (manifest, fingerprint)
+    return fingerprints
+
+
+# pylint: disable-next=too-many-arguments
+def render_outputs(args, env, files, *, title, timer, embedder=None):
+    """Render *files* with each of args.profiles into its args.outputs.
+
+    The files, data and metadata are loaded once and shared by every
+    output. With --incremental, only the outputs whose inputs changed are
+    rendered. Images are embedded by *embedder*, if given. Return the exit
+    status.
+    """
+    targets = list(zip(args.profiles, args.outputs))
+    fingerprints = {}
+    if args.incremental:
+        with timer.phase("fingerprint"):
+            fingerprints = _stale_fingerprints(args, env, files, targets, title)
+        targets = [target for target in targets if target[1] in fingerprints]
+        if not targets:
+            return EX_OK
+    try:
+        errors = _render_targets(args, env, files, targets, title=title,
+                                 timer=timer, embedder=embedder)
+    except _FatalError as err:
+        return err.status
+
+    status = EX_OK
+    for (_, output), error in zip(targets, errors):
+        if error is not None:
+            logging.error("unable to write to output: %s", error)
+            status = EX_OUTPUT
+        elif output in fingerprints:
+            manifest, fingerprint = fingerprints[output]
+            manifest.save(fingerprint)
+    return status
@@ -0,0 +1,81 @@
+"""Split a gallery into pages, written as documents linked by an index page."""
+
+import collections
+import logging
+import os
+
+from .main import EX_NOTEMPLATE, EX_OUTPUT, _FatalError, emit
+
+INDEX_TMPL_NAME = "builtin/include/index.html.jinja"
+PAGE_INDEX_NAME = "index.html"
+
+
+# Position of one page in a gallery split into several documents
+Pagination = collections.namedtuple(
+    "Pagination", "number count offset total name previous next index",
+    defaults=(None, None, PAGE_INDEX_NAME))
+
+
+def page_name(number, count):
+    """Return the file name of page *number* of *count*.
+
+    >>> page_name(7, 120)
+    'page007.html'
+    """
+    return f"page{number:0{len(str(count))}d}.html"
+
+
+def paginate(files, page_size=None):
+    """Split *files* into pages of at most *page_size* files.
+
+    Return a list of (Pagination, files) pairs. There is always at least one
+    page, even if *files* is empty.
+    """
+    page_size = page_size or len(files) or 1
+    count = max(1, -(-len(files) // page_size))
+    names = [page_name(number, count) for number in range(1, count + 1)]
+    pages = []
+    for ind, name in enumerate(names):
+        offset = ind * page_size
+        pagination = Pagination(
+            number=ind + 1, count=count, offset=offset, total=len(files),
+            name=name,
+            previous=names[ind - 1] if ind > 0 else None,
+            next=names[ind + 1] if ind + 1 < count else None)
+        pages.append((pagination, files[offset:offset + page_size]))
+    return pages
+
+
+# pylint: disable-next=too-many-arguments
+def write_pages(directory, env, template, context, page_size=None, *,
+                precompress=False):
+    """Render the files in *context* as pages in *directory*.
+
+    Each page holds at most *page_size* files and is rendered from
+    *template*. An index page linking to every page is written alongside.
+    If *precompress* is true, compressed copies of each page are written
+    next to it.
+    """
+    from jinja2 import TemplateNotFound
+
+    pages = paginate(context["files"], page_size)
+    try:
+        index_template = env.get_template(INDEX_TMPL_NAME)
+    except TemplateNotFound as err:
+        logging.error("template not found: %s", err.message)
+        raise _FatalError(EX_NOTEMPLATE) from err
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for pagination, files in pages:
+            page_path = os.path.join(directory, pagination.name)
+            with open(page_path, 'w', encoding="UTF-8") as outfile:
+                emit(outfile, template,
+                     {**context, "files": files, "pagination": pagination},
+                     compressed_path=page_path if precompress else None)
+        index_path = os.path.join(directory, PAGE_INDEX_NAME)
+        with open(index_path, 'w', encoding="UTF-8") as outfile:
+            emit(outfile, index_template, {**context, "pages": pages},
+                 compressed_path=index_path if precompress else None)
+    except OSError as err:
+        logging.error("unable to write to output: %s", err)
+        raise _FatalError(EX_OUTPUT) from err
@@ -0,0 +1,99 @@
+"""Render galleries from Python, without the command-line interface.
+
+>>> renderer = Renderer()
+>>> html = renderer.render(["10.jpg", "2.jpg"], title="Holiday")
+>>> html.index("2.jpg") < html.index("10.jpg")
+True
+"""
+
+import functools
+
+from .main import (EMIT_BUFFER_SIZE, OPTION_DEFAULTS, StatCache,
+                   add_default_suffix, create_paths, emit, from_string_cached,
+                   get_bytecode_cache, get_environment)
+
+DEFAULT_MAX_TEMPLATES = 128
+DEFAULT_PROFILE = OPTION_DEFAULTS["profile"]
+
+
+class Renderer:
+    """Renderer of galleries that keeps its templates compiled between calls.
+
+    *profiles* maps profile names to directories of templates, like the
+    [profiles] section of the configuration file; "builtin" is always
+    available. Unlike main(), no configuration files are read and logging
+    is not configured. If *cache* is true, compiled templates are also
+    cached on disk (see get_bytecode_cache). If *minify* is true, the CSS
+    and JavaScript included by templates is minified.
+
+    Up to *max_templates* templates loaded by profile name, and as many
+    loaded from source strings, are kept compiled in memory. A Renderer can
+    be shared between threads.
+
+    Errors loading templates raise the exceptions of jinja2, such as
+    jinja2.TemplateNotFound and jinja2.TemplateSyntaxError.
+    """
+
+    def __init__(self, profiles=None, *, cache=False, minify=False,
+                 max_templates=DEFAULT_MAX_TEMPLATES):
+        bytecode_cache = get_bytecode_cache() if cache else None
+        self.env = get_environment((profiles or {}).items(), minify=minify,
+                                   bytecode_cache=bytecode_cache,
+                                   cache_size=max_templates)
+        self._from_source = functools.lru_cache(maxsize=max_templates)(
+            functools.partial(from_string_cached, self.env))
+
+    def get_template(self, profile=DEFAULT_PROFILE, source=None):
+        """Return the compiled template of *profile*, or of *source* if given.
+
+        As on the command line, a profile name without a template name,
+        like "builtin", stands for the template default.html of the profile.
+        """
+        if source is not None:
+            return self._from_source(source)
+        return self.env.get_template(add_default_suffix(profile))
+
+    # pylint: disable-next=too-many-arguments
+    def context(self, paths, *, title="", data=None, sort="human",
+                ignore_case=True, directory=None):
+        """Return the template context of a gallery of the image *paths*.
+
+        *paths* are sorted by the sort method *sort*, one of the choices of
+        --sort. Paths are relative to *directory* when sorting by file
+        status. *data* is made available to templates as data.
+        """
+        files = create_paths(paths, sort, caseless=ignore_case,
+                             stat_cache=StatCache(directory))
+        return {"title": title,
+                "files": files,
+                "data": {} if data is None else data,
+                "pagination": None}
+
+    def generate(self, paths, *, profile=DEFAULT_PROFILE, source=None,
+                 **options):
+        """Render a gallery of *paths*, yielding the document in pieces.
+
+        The template is that of *profile*, or *source* if given. The other
+        *options* are those of context().
+        """
+        template = self.get_template(profile, source)
+        return template.generate(self.context(paths, **options))
+
+    def render(self, paths, *, profile=DEFAULT_PROFILE, source=None, **options):
+        """Render a gallery of *paths* and return the document as a string.
+
+        The arguments are those of generate().
+        """
+        template = self.get_template(profile, source)
+        return template.render(self.context(paths, **options))
+
+    # pylint: disable-next=too-many-arguments
+    def stream(self, outfile, paths, *, profile=DEFAULT_PROFILE, source=None,
+               buffer_size=EMIT_BUFFER_SIZE, **options):
+        """Render a gallery of *paths* into the text stream *outfile*.
+
+        The document is written in pieces of about *buffer_size* characters.
+        The other arguments are those of generate().
+        """
+        template = self.get_template(profile, source)
+        emit(outfile, template, self.context(paths, **options), buffer_size)
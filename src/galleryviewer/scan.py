@@ -0,0 +1,182 @@
+"""Find image files in directory trees, scanning directories concurrently."""
+
+import fnmatch
+import logging
+import os
+import re
+
+from .main import EX_NOINPUT, _FatalError, is_image_name
+
+
+def compile_patterns(patterns):
+    """Return a function matching a (name, relative path) pair to *patterns*.
+
+    Patterns are shell-style wildcards, matched case-sensitively. Patterns
+    containing a "/" are matched against the path relative to the scanned
+    directory, and the others against the file name. Return None if there
+    are no *patterns*.
+
+    >>> matches = compile_patterns(["*.jpg", "raw/*"])
+    >>> matches("a.jpg", "x/a.jpg"), matches("b.png", "raw/b.png")
+    (True, True)
+    >>> matches("b.png", "x/raw/b.png")
+    False
+    """
+    if not patterns:
+        return None
+
+    def compile_any(subset):
+        if not subset:
+            return None
+        return re.compile("|".join(fnmatch.translate(pattern) for pattern in subset))
+
+    name_re = compile_any([pattern for pattern in patterns if "/" not in pattern])
+    path_re = compile_any([pattern for pattern in patterns if "/" in pattern])
+
+    def matches(name, path):
+        return bool((name_re is not None and name_re.match(name))
+                    or (path_re is not None and path_re.match(path)))
+    return matches
+
+
+class _Scanner:
+    """Settings of a scan, and the scans of directories."""
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(self, root, include=None, exclude=None, max_depth=None,
+                 stat_cache=None):
+        self.root = root
+        # Paths under the current directory are given without "./"
+        self.prefix = "" if os.path.normpath(root) == os.curdir else root
+        self.include = compile_patterns(include)
+        self.exclude = compile_patterns(exclude)
+        self.max_depth = max_depth
+        self.stat_cache = stat_cache
+
+    def scan(self, relative, depth):
+        """Return the image paths and the subdirectories in *relative*.
+
+        The subdirectories are (relative path, depth) pairs. Both are sorted
+        by name.
+        """
+        paths = []
+        subdirectories = []
+        with os.scandir(os.path.join(self.root, relative)) as entries:
+            for entry in entries:
+                name = entry.name
+                entry_relative = f"{relative}/{name}" if relative else name
+                if self.exclude is not None and self.exclude(name, entry_relative):
+                    continue
+                try:
+                    # Uses the type from the directory entry, without a stat
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.max_depth is None or depth < self.max_depth:
+                            subdirectories.append((entry_relative, depth + 1))
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if self.include is None:
+                    if not is_image_name(name):
+                        continue
+                elif not self.include(name, entry_relative):
+                    continue
+                path = os.path.join(self.prefix, entry_relative)
+                if self.stat_cache is not None:
+                    try:
+                        self.stat_cache.set(path, entry.stat())
+                    except OSError:
+                        pass
+                paths.append(path)
+        paths.sort()
+        subdirectories.sort()
+        return paths, subdirectories
+
+    def scan_tree(self, max_workers=None):
+        """Return the scans of the root and the directories in its tree.
+
+        The scans are the results of scan() by relative path. Directories
+        are scanned concurrently by up to *max_workers* threads. Raise
+        OSError if the root can't be scanned. Subdirectories that can't be
+        scanned are skipped with a warning.
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        scans = {"": self.scan("", 0)}
+        if not scans[""][1]:
+            return scans
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Relative paths of the directories being scanned, by future
+            pending = {executor.submit(self.scan, *subdirectory): subdirectory[0]
+                       for subdirectory in scans[""][1]}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    relative = pending.pop(future)
+                    try:
+                        scans[relative] = future.result()
+                    except OSError as err:
+                        logging.warning("unable to scan directory: %s", err)
+                        continue
+                    pending.update(
+                        (executor.submit(self.scan, *subdirectory), subdirectory[0])
+                        for subdirectory in scans[relative][1])
+        return scans
+
+
+def _tree_order(scans):
+    """Yield the paths of *scans* (see _Scanner.scan_tree) in tree order."""
+    pending = [""]
+    while pending:
+        scan = scans.get(pending.pop())
+        if scan is None:
+            continue
+        paths, subdirectories = scan
+        yield from paths
+        pending.extend(relative for relative, _ in reversed(subdirectories))
+
+
+# pylint: disable-next=too-many-arguments
+def scan_directory(root, *, include=None, exclude=None, max_depth=None,
+                   max_workers=None, stat_cache=None):
+    """Return the paths of the image files in the tree under *root*.
+
+    Files are found by their image file extension, or if *include* is given,
+    by matching any of its patterns (see compile_patterns). Files and
+    directories matching a pattern in *exclude* are skipped. Directories
+    deeper than *max_depth* levels below *root* are not scanned, and
+    symbolic links to directories are not followed.
+
+    Directories are scanned concurrently by up to *max_workers* threads,
+    but the paths are returned in the same order every time: the files of a
+    directory sorted by name, then the files in each of its subdirectories,
+    in the same order. If *stat_cache* (a StatCache) is given, the status
+    of every file is read into it.
+
+    Raise _FatalError if *root* can't be scanned. Subdirectories that can't
+    be scanned are skipped with a warning.
+    """
+    scanner = _Scanner(root, include, exclude, max_depth, stat_cache)
+    try:
+        scans = scanner.scan_tree(max_workers)
+    except OSError as err:
+        logging.error("unable to scan directory: %s", err)
+        raise _FatalError(EX_NOINPUT) from err
+    return list(_tree_order(scans))
+
+
+def scan_directories(roots, **kwargs):
+    """Yield the paths of the image files in the trees under *roots*.
+
+    The paths of each root are found by scan_directory(), with *kwargs*.
+    Paths already found under an earlier root, which overlaps with the
+    current one, are skipped.
+    """
+    found = set()
+    for root in roots:
+        for path in scan_directory(root, **kwargs):
+            key = os.path.abspath(path)
+            if key not in found:
+                found.add(key)
+                yield path
@@ -0,0 +1,323 @@
+"""Serve a gallery over HTTP on the loopback interface, rendered on request."""
+
+import collections
+import io
+import logging
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, unquote_to_bytes, urlsplit
+
+from . import _PROG, __version__
+from .main import (EX_NOTEMPLATE, EX_OK, EX_OUTPUT, StatCache, _FatalError,
+                   create_paths, emit, get_bytecode_cache, get_environment,
+                   iter_path_args, load_data_file, load_meta_file,
+                   load_template, probe_files)
+from .manifest import InputCache, compute_fingerprint, fingerprint_options
+
+LOOPBACK = "127.0.0.1"
+DEFAULT_PORT = 8000
+DOCUMENT_URLS = frozenset({"/", "/index.html"})
+# URL path under which images are served, each by its arg as one segment
+IMAGE_URL_PREFIX = "/images/"
+
+# A rendered document. Its etag is None if it can't be cached.
+Document = collections.namedtuple("Document", "fingerprint etag body mtime")
+
+
+class RangeNotSatisfiable(ValueError):
+    """A byte range lies outside of the file."""
+
+
+def parse_range(header, size):
+    """Return (start, end) of the byte range in the Range *header*.
+
+    *end* is exclusive and *size* is the size of the file. Return None if
+    the header should be ignored: if it is malformed or has several ranges.
+    Raise RangeNotSatisfiable if the range lies outside of the file.
+
+    >>> parse_range("bytes=0-99", 1000)
+    (0, 100)
+    >>> parse_range("bytes=900-", 1000), parse_range("bytes=-100", 1000)
+    ((900, 1000), (900, 1000))
+    >>> parse_range("bytes=0-1,5-6", 1000) is None
+    True
+    """
+    unit, _, spec = header.partition("=")
+    first, sep, last = spec.strip().partition("-")
+    if unit.strip() != "bytes" or not sep or not (first + last).isdigit():
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - suffix, 0), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(int(last) + 1, size) if last else size
+
+
+def image_url(arg):
+    """Return the URL path of the image at path *arg*.
+
+    Slashes are encoded too, so that every path, even one outside of the
+    current directory, gets a URL of its own that clients don't normalize.
+
+    >>> image_url("1.jpg"), image_url("../photos/1 2.jpg")
+    ('/images/1.jpg', '/images/..%2Fphotos%2F1%202.jpg')
+    """
+    return IMAGE_URL_PREFIX + quote(os.fsencode(arg), safe="")
+
+
+def image_arg(url_path):
+    """Return the path of the image at *url_path*, or None if it isn't one.
+
+    >>> image_arg("/images/..%2Fphotos%2F1%202.jpg"), image_arg("/1.jpg")
+    ('../photos/1 2.jpg', None)
+    """
+    if not url_path.startswith(IMAGE_URL_PREFIX):
+        return None
+    name = url_path[len(IMAGE_URL_PREFIX):]
+    if not name or "/" in name:
+        return None
+    return os.fsdecode(unquote_to_bytes(name))
+
+
+class Gallery:
+    """The document rendered from the parsed arguments *args*, kept in memory.
+
+    The document is rendered again only when the fingerprint of its inputs
+    changes (see manifest.compute_fingerprint), or on every request if the
+    fingerprint can't be computed. Images are served at the URLs of
+    image_url(), which are the src of the files.
+    """
+
+    def __init__(self, args, env, title):
+        self.args = args
+        self.env = env
+        self.title = title
+        # Args of the images of the last document
+        self.images = frozenset()
+        self._inputs = InputCache()
+        self._document = None
+        self._lock = threading.Lock()
+
+    def _files(self):
+        stat_cache = StatCache()
+        return create_paths(iter_path_args(self.args, stat_cache),
+                            sort_method=self.args.sort,
+                            caseless=self.args.ignore_case, stat_cache=stat_cache)
+
+    def find_image(self, url_path):
+        """Return the arg of the image at *url_path*, or None if it isn't one.
+
+        Only the images of the last document are found.
+        """
+        arg = image_arg(url_path)
+        return arg if arg in self.images else None
+
+    def document(self):
+        """Return the current Document, rendering it if its inputs changed.
+
+        Raise _FatalError if the document can't be rendered.
+        """
+        from jinja2 import TemplateError
+
+        args = self.args
+        with self._lock:
+            files = self._files()
+            for file in files:
+                file.src = image_url(file.arg)
+            self.images = frozenset(file.arg for file in files)
+            if args.probe:
+                probe_files(files, cache=args.cache)
+            fingerprint = compute_fingerprint(
+                self.env, files, profile=args.profile, template_file=args.template,
+                data_file=args.data_file, meta_file=args.meta_file,
+                options=fingerprint_options(args, self.title), cache=self._inputs)
+            if fingerprint is not None and self._document is not None \
+                    and self._document.fingerprint == fingerprint:
+                return self._document
+            data = load_data_file(file=args.data_file)
+            buffer = io.StringIO()
+            with load_meta_file(files, file=args.meta_file):
+                try:
+                    template = load_template(self.env, name=args.profile,
+                                             file=args.template)
+                    context = {"title": self.title, "files": files,
+                               "data": data, "pagination": None}
+                    emit(buffer, template, context)
+                except TemplateError as err:
+                    # Keep serving while the template is being edited
+                    logging.error("unable to render template: %s", err)
+                    raise _FatalError(EX_NOTEMPLATE) from err
+            etag = None if fingerprint is None else f'"{fingerprint}"'
+            self._document = Document(fingerprint, etag,
+                                      buffer.getvalue().encode("UTF-8"), time.time())
+            return self._document
+
+
+class GalleryRequestHandler(BaseHTTPRequestHandler):
+    """Serve the document of server.gallery and the images in it."""
+
+    server_version = f"{_PROG}/{__version__}"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.send_resource(head=False)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self.send_resource(head=True)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.info("%s - %s", self.address_string(), format % args)
+
+    def send_resource(self, head):
+        path = urlsplit(self.path).path
+        if posixpath.normpath(unquote(path)) in DOCUMENT_URLS:
+            self.send_document(head)
+            return
+        arg = self.server.gallery.find_image(path)
+        if arg is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            file = open(arg, 'rb')  # pylint: disable=consider-using-with
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        with file:
+            self.send_file(file, mimetypes.guess_type(arg)[0], head)
+
+    def is_not_modified(self, etag, mtime):
+        """Return True if the client's copy with *etag* and *mtime* is current."""
+        if etag is None:
+            return False
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+
+    def send_validators(self, etag, mtime):
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+
+    def send_not_modified(self, etag, mtime):
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_validators(etag, mtime)
+        self.end_headers()
+
+    def send_document(self, head):
+        try:
+            document = self.server.gallery.document()
+        except _FatalError:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                            "unable to render the gallery; see the server log")
+            return
+        if self.is_not_modified(document.etag, document.mtime):
+            self.send_not_modified(document.etag, document.mtime)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(document.body)))
+        # Revalidate on every load, so changes show up at once
+        self.send_header("Cache-Control", "no-cache")
+        self.send_validators(document.etag, document.mtime)
+        self.end_headers()
+        if not head:
+            self.wfile.write(document.body)
+
+    def send_file(self, file, content_type, head):
+        """Send the binary *file*, or the part of it the client asked for."""
+        stat = os.fstat(file.fileno())
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        if self.is_not_modified(etag, stat.st_mtime):
+            self.send_not_modified(etag, stat.st_mtime)
+            return
+        size = stat.st_size
+        start, end = 0, size
+        byte_range = None
+        range_header = self.headers.get("Range")
+        if range_header is not None and self.headers.get("If-Range", etag) == etag:
+            try:
+                byte_range = parse_range(range_header, size)
+            except RangeNotSatisfiable:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        if byte_range is None:
+            self.send_response(HTTPStatus.OK)
+        else:
+            start, end = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.send_header("Content-Type", content_type or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_validators(etag, stat.st_mtime)
+        self.end_headers()
+        if head or end == start:
+            return
+        try:
+            # Uses sendfile(2) where available
+            self.connection.sendfile(file, start, end - start)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class GalleryServer(ThreadingHTTPServer):
+    """HTTP server of a Gallery, one thread per connection."""
+
+    daemon_threads = True
+
+    def __init__(self, address, gallery):
+        super().__init__(address, GalleryRequestHandler)
+        self.gallery = gallery
+
+
+def make_server(args, profiles, port=0):
+    """Return a GalleryServer of the gallery of *args* on the loopback *port*.
+
+    *profiles* are (profile, path) pairs of the configured profiles. Raise
+    OSError if the server can't listen on *port*.
+    """
+    bytecode_cache = get_bytecode_cache() if args.cache else None
+    env = get_environment(profiles, minify=args.minify,
+                          bytecode_cache=bytecode_cache)
+    title = args.title or os.path.basename(os.getcwd())
+    return GalleryServer((LOOPBACK, port), Gallery(args, env, title))
+
+
+def serve(args, profiles, port=DEFAULT_PORT):
+    """Serve the gallery of *args* on the loopback *port* until interrupted."""
+    try:
+        server = make_server(args, profiles, port)
+    except OSError as err:
+        logging.error("unable to start server: %s", err)
+        return EX_OUTPUT
+    with server:
+        host, port = server.server_address[:2]
+        logging.info("serving on http://%s:%d/", host, port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return EX_OK
@@ -0,0 +1,45 @@
+// Page navigation by keyboard and mouse, shared by the builtin viewers.
+// Expects pageIndex, pageCount and openPage(pageNumber) to be defined.
+
+// Increment page number by *n*
+function plusPage(n) {
+    let pageNumber = pageIndex + n;
+
+    // Overflow/underflow behavior: wrap around
+    if (pageNumber >= pageCount) {pageNumber = 0}
+    else if (pageNumber < 0) {pageNumber = pageCount - 1}
+
+    openPage(pageNumber);
+}
+
+function processClick(e) {
+    const xThreshold = 0.4;
+    const xClickPos = e.offsetX / e.currentTarget.clientWidth;
+
+    if (xClickPos < xThreshold) {
+        plusPage(-1);
+    } else {
+        plusPage(1);
+    }
+}
+
+const SCROLL_AMOUNT = 40;
+
+function processKeyDown(e) {
+    switch (e.key.toLowerCase()) {
+        case 'a':
+            plusPage(-1); return;
+        case 'd':
+            plusPage(1); return;
+        case 'w':
+            window.scrollBy(0, -SCROLL_AMOUNT); return;
+        case 's':
+            window.scrollBy(0, SCROLL_AMOUNT); return;
+    }
+    switch (e.key) {
+        case "ArrowLeft":
+            plusPage(-1); return;
+        case "ArrowRight":
+            plusPage(1); return;
+    }
+}
@@ -0,0 +1,32 @@
+// Image preloading policy, shared by the builtin viewers.
+
+// Load the images of this many pages on either side of the current page
+const PRELOAD_DISTANCE = 2;
+// Release the images of pages further than this from the current page
+const EVICT_DISTANCE = 8;
+
+// Number of steps between two pages, counting wrap-around
+function pageDistance(a, b) {
+    const distance = Math.abs(a - b);
+    return Math.min(distance, pageCount - distance);
+}
+
+// Indexes of *pageNumber* and its neighbors within PRELOAD_DISTANCE
+function nearbyPages(pageNumber) {
+    const result = [pageNumber];
+
+    for (let n = 1; n <= PRELOAD_DISTANCE && result.length < pageCount; n++) {
+        result.push((pageNumber + n) % pageCount);
+        if (result.length < pageCount) {
+            result.push((pageNumber - n + pageCount) % pageCount);
+        }
+    }
+    return result;
+}
+
+// Start fetching and decoding *image* off the critical path
+function decodeImage(image) {
+    if (image.decode) {
+        image.decode().catch(function() {});
+    }
+}
@@ -3,8 +3,18 @@ let pageIndex = 0;
 const tabs = document.getElementsByClassName("tab");
 const pages = document.getElementsByClassName("page");
 const images = document.getElementsByClassName("image-item");
+const pageCount = pages.length;
+// Indexes of the images whose src is currently set
+const loadedImages = new Set();
 
-openPage(pageIndex);
+// Hide all elements with class="page"; openPage() shows one at a time
+for (let i = 0; i < pages.length; i++) {
+    pages[i].style.display = "none";
+}
+
+if (pageCount > 0) {
+    openPage(pageIndex);
+}
 
 // onclick="openPage(i)"
 for (let i = 0; i < tabs.length; i++) {
@@ -19,67 +29,34 @@ for (let i = 0; i < images.length; i++) {
 
 // Show page (0 indexed) and update pageIndex
 function openPage(pageNumber) {
-    var i;
-
-    // Hide all elements with class="page"
-    for (i = 0; i < pages.length; i++) {
-        pages[i].style.display = "none";
-    }
-
-    // Remove the class "active" from all elements with class="tab"
-    for (i = 0; i < tabs.length; i++) {
-        tabs[i].className = tabs[i].className.replace(" active", "");
-    }
+    // Hide the previous page and remove the class "active" from its tab
+    pages[pageIndex].style.display = "none";
+    tabs[pageIndex].className = tabs[pageIndex].className.replace(" active", "");
 
     // Show the current page
     pages[pageNumber].style.display = "block";
     // Add an "active" class to the tab for the current page
     tabs[pageNumber].className += " active";
 
+    updateImages(pageNumber);
     window.scroll(0, 0);
 
     pageIndex = pageNumber;
 }
 
-// Increment page number by *n*
-function plusPage(n) {
-    let pageNumber = pageIndex + n;
-
-    // Overflow/underflow behavior: wrap around
-    if (pageNumber >= pages.length) {pageNumber = 0}
-    else if (pageNumber < 0) {pageNumber = pages.length - 1}
-
-    openPage(pageNumber);
-}
-
-function processClick(e) {
-    const xThreshold = 0.4;
-    const xClickPos = e.offsetX / e.currentTarget.clientWidth;
-
-    if (xClickPos < xThreshold) {
-        plusPage(-1);
-    } else {
-        plusPage(1);
-    }
-}
-
-const SCROLL_AMOUNT = 40;
-
-function processKeyDown(e) {
-    switch (e.key.toLowerCase()) {
-        case 'a':
-            plusPage(-1); return;
-        case 'd':
-            plusPage(1); return;
-        case 'w':
-            window.scrollBy(0, -SCROLL_AMOUNT); return;
-        case 's':
-            window.scrollBy(0, SCROLL_AMOUNT); return;
+// Load the images near *pageNumber* and release those far from it
+function updateImages(pageNumber) {
+    for (const i of nearbyPages(pageNumber)) {
+        if (!loadedImages.has(i)) {
+            images[i].src = images[i].dataset.src;
+            decodeImage(images[i]);
+            loadedImages.add(i);
+        }
     }
-    switch (e.key) {
-        case "ArrowLeft":
-            plusPage(-1); return;
-        case "ArrowRight":
-            plusPage(1); return;
+    for (const i of loadedImages) {
+        if (pageDistance(i, pageNumber) > EVICT_DISTANCE) {
+            images[i].removeAttribute("src");
+            loadedImages.delete(i);
+        }
     }
 }
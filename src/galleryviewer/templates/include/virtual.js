@@ -0,0 +1,104 @@
+// Viewer that builds page nodes on demand from the JSON file list, so that
+// its cost doesn't grow with the number of files.
+
+const files = JSON.parse(document.getElementById("file-list").textContent);
+// URLs of the files, where they differ from their paths, like embedded images
+const sourceList = document.getElementById("source-list");
+const sources = sourceList ? JSON.parse(sourceList.textContent) : files;
+const content = document.getElementById("content");
+const offset = Number(content.dataset.offset);
+const total = Number(content.dataset.total);
+const pageCount = files.length;
+
+const tabContainer = document.getElementById("tab-container");
+const pageNumberSpan = document.querySelector(".page-number");
+const imageNameSpan = document.querySelector(".image-name");
+const image = document.querySelector(".image-item");
+
+// Number of tabs rendered on either side of the current page
+const TAB_WINDOW = 50;
+
+let pageIndex = 0;
+let tabStart = 0;
+let tabs = [];
+// Off-screen images holding the files near the current page, by index
+const preloadedImages = new Map();
+
+image.addEventListener("click", processClick);
+document.addEventListener("keydown", processKeyDown);
+
+if (pageCount > 0) {
+    openPage(pageIndex);
+}
+
+// Render the tabs around *pageNumber*, replacing the previous ones
+function renderTabs(pageNumber) {
+    tabStart = Math.max(0, pageNumber - TAB_WINDOW);
+    const tabEnd = Math.min(pageCount, pageNumber + TAB_WINDOW + 1);
+    const fragment = document.createDocumentFragment();
+
+    tabs = [];
+    for (let i = tabStart; i < tabEnd; i++) {
+        const tab = document.createElement("button");
+        tab.className = "tab";
+        tab.textContent = offset + i + 1;
+        tab.addEventListener("click", function() {openPage(i)});
+        fragment.appendChild(tab);
+        tabs.push(tab);
+    }
+    tabContainer.replaceChildren(fragment);
+}
+
+// Whether *pageNumber* is missing from or near an edge of the rendered tabs
+function tabsNeedRender(pageNumber) {
+    const tabEnd = tabStart + tabs.length;
+    const margin = TAB_WINDOW / 2;
+
+    return pageNumber < tabStart || pageNumber >= tabEnd ||
+        (tabStart > 0 && pageNumber < tabStart + margin) ||
+        (tabEnd < pageCount && pageNumber >= tabEnd - margin);
+}
+
+function getTab(pageNumber) {
+    return tabs[pageNumber - tabStart];
+}
+
+// Show page (0 indexed) and update pageIndex
+function openPage(pageNumber) {
+    const oldTab = getTab(pageIndex);
+
+    if (oldTab) {
+        oldTab.classList.remove("active");
+    }
+    if (tabsNeedRender(pageNumber)) {
+        renderTabs(pageNumber);
+    }
+    getTab(pageNumber).classList.add("active");
+
+    pageNumberSpan.textContent = (offset + pageNumber + 1) + " / " + total;
+    imageNameSpan.textContent = files[pageNumber];
+    image.src = sources[pageNumber];
+
+    preloadImages(pageNumber);
+    window.scroll(0, 0);
+
+    pageIndex = pageNumber;
+}
+
+// Fetch and decode the files near *pageNumber* and release those far from it
+function preloadImages(pageNumber) {
+    for (const i of nearbyPages(pageNumber)) {
+        if (i !== pageNumber && !preloadedImages.has(i)) {
+            const preloaded = new Image();
+            preloaded.src = sources[i];
+            decodeImage(preloaded);
+            preloadedImages.set(i, preloaded);
+        }
+    }
+    for (const [i, preloaded] of preloadedImages) {
+        if (pageDistance(i, pageNumber) > EVICT_DISTANCE) {
+            preloaded.removeAttribute("src");
+            preloadedImages.delete(i);
+        }
+    }
+}
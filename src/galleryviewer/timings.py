@@ -0,0 +1,65 @@
+"""Measure the phases of a run, and profile it."""
+
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+
+def _max_rss():
+    """Return the peak resident set size of the process in KiB, if known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kibibytes elsewhere
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss
+
+
+class PhaseTimer:
+    """Wall time, CPU time and peak memory of the phases of a run."""
+
+    def __init__(self):
+        self.start = (time.perf_counter(), time.process_time())
+        # (name, wall seconds, CPU seconds, peak RSS in KiB) tuples
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the phase *name* while in the context."""
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - wall,
+                                time.process_time() - cpu, _max_rss()))
+
+    def report(self, file, status):
+        """Write the measurements as a JSON record on a line of *file*."""
+        import json
+
+        wall, cpu = self.start
+        record = {
+            "status": status,
+            "wall": time.perf_counter() - wall,
+            "cpu": time.process_time() - cpu,
+            "max_rss_kib": _max_rss(),
+            "phases": [{"name": name, "wall": wall, "cpu": cpu, "max_rss_kib": rss}
+                       for name, wall, cpu, rss in self.phases],
+        }
+        print(json.dumps(record), file=file)
+
+
+def run_profiled(path, func, *args):
+    """Call *func* with *args* under cProfile, and dump the stats to *path*."""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        try:
+            profiler.dump_stats(path)
+        except OSError as err:
+            logging.warning("unable to write profile: %s", err)
@@ -0,0 +1,278 @@
+"""Keep a document up to date as its inputs change."""
+
+import bisect
+import collections
+import logging
+import os
+import time
+
+from .main import (EX_NOINPUT, EX_NOTEMPLATE, EX_OK, EX_OUTPUT,
+                   STAT_SORT_FIELDS, ImagePath, StatCache, _FatalError, emit,
+                   generate_path_args, get_key_function, load_data_file,
+                   load_meta_file, load_template, probe_files,
+                   replace_atomically)
+
+WATCH_INTERVAL = 1.0
+
+
+def file_signature(path):
+    """Return the (modification time, size) of *path*, or None if missing."""
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SortedPaths:
+    """A sorted list of ImagePaths that paths can be added to and removed from.
+
+    The position of a path is found by binary search on the sort keys
+    cached in the ImagePaths, so the list is never sorted again. Ties are
+    broken by the order in which the paths were added, as create_paths()
+    does. With a *key_func* of None, paths keep the order they were added
+    in, or the order of the args given to update().
+    """
+
+    def __init__(self, key_func=None):
+        self.key_func = key_func
+        self.files = []
+        # (sort key, index) of each ImagePath in files
+        self._keys = []
+        self._by_arg = collections.defaultdict(list)
+        self._count = 0
+
+    def __len__(self):
+        return len(self.files)
+
+    def args(self):
+        return collections.Counter({arg: len(files)
+                                    for arg, files in self._by_arg.items()
+                                    if files})
+
+    def add(self, arg):
+        """Insert a new ImagePath of *arg* in order, and return it."""
+        sort_key = None if self.key_func is None else self.key_func(arg)
+        file = ImagePath(arg, self._count, sort_key)
+        self._count += 1
+        key = (0 if sort_key is None else sort_key, file.index)
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self.files.insert(position, file)
+        self._by_arg[arg].append(file)
+        return file
+
+    def remove(self, arg):
+        """Remove the last added ImagePath of *arg*, and return it."""
+        file = self._by_arg[arg].pop()
+        key = (0 if file.sort_key is None else file.sort_key, file.index)
+        position = bisect.bisect_left(self._keys, key)
+        del self._keys[position]
+        del self.files[position]
+        return file
+
+    def update(self, args):
+        """Add and remove ImagePaths so that they match the path *args*.
+
+        Return the ImagePaths that were added, and whether any others were
+        removed or moved.
+        """
+        args = list(args)
+        wanted = collections.Counter(args)
+        current = self.args()
+        removed = current - wanted
+        for arg, count in removed.items():
+            for _ in range(count):
+                self.remove(arg)
+        added = [self.add(arg) for arg, count in (wanted - current).items()
+                 for _ in range(count)]
+        moved = False
+        if self.key_func is None:
+            moved = self._reorder(args)
+        return added, bool(removed) or moved
+
+    def _reorder(self, args):
+        """Put the ImagePaths in the order of *args*; return True if any moved.
+
+        The ImagePaths are numbered again by their position, so that those
+        added later go last.
+        """
+        if [file.arg for file in self.files] == args:
+            return False
+        unused = {arg: iter(files) for arg, files in self._by_arg.items()}
+        self.files = [next(unused[arg]) for arg in args]
+        for index, file in enumerate(self.files):
+            file.index = index
+        self._keys = [(0, index) for index in range(len(self.files))]
+        self._count = len(self.files)
+        return True
+
+
+# pylint: disable-next=too-many-instance-attributes
+class Watcher:
+    """The inputs and document of the parsed arguments *args*, kept in memory.
+
+    poll() reloads only the inputs that changed: the paths read from
+    --files-from, the template, the data file or the meta file.
+    """
+
+    def __init__(self, args, env, title):
+        self.args = args
+        self.env = env
+        self.title = title
+        self.stat_cache = StatCache()
+        self.paths = SortedPaths(
+            get_key_function(args.sort, args.ignore_case, self.stat_cache))
+        self.template = None
+        # Source files of the template and the templates it references
+        self.template_files = []
+        self.data = None
+        self.meta_index = None
+        # Signatures of the input files when they were last loaded
+        self.signatures = {}
+
+    def _read_args(self):
+        delimiter = "\0" if self.args.null else "\n"
+        try:
+            return list(generate_path_args(self.args.paths, self.args.files_from,
+                                           delimiter))
+        except OSError as err:
+            logging.error("unable to read paths file: %s", err)
+            raise _FatalError(EX_NOINPUT) from err
+
+    def _changed(self, name, path):
+        signature = file_signature(path)
+        if name in self.signatures and self.signatures[name] == signature:
+            return False
+        self.signatures[name] = signature
+        return True
+
+    def _template_changed(self):
+        changed = [self._changed(("template", path), path)
+                   for path in self.template_files]
+        return any(changed)
+
+    def load_paths(self):
+        args = self._read_args()
+        if self.args.sort in STAT_SORT_FIELDS:
+            self.stat_cache.update(args)
+        added, changed = self.paths.update(args)
+        if added and self.args.probe:
+            probe_files(added, cache=self.args.cache, stat_cache=self.stat_cache)
+        if added or changed:
+            logging.info("%d paths added, %d paths in total",
+                         len(added), len(self.paths))
+        return bool(added or changed)
+
+    def load_template(self):
+        from jinja2 import TemplateError
+
+        from .manifest import template_sources
+
+        env = self.env
+        try:
+            self.template = load_template(env, name=self.args.profile,
+                                          file=self.args.template)
+            if self.args.template is None:
+                self.template_files = [
+                    env.loader.get_source(env, name)[1]
+                    for name in template_sources(env, self.args.profile)]
+            else:
+                self.template_files = [self.args.template]
+        except TemplateError as err:
+            logging.error("unable to load template: %s", err)
+            # Watch the file with the error too, in case it is new
+            filename = getattr(err, "filename", None)
+            if filename is not None and filename not in self.template_files:
+                self.template_files.append(filename)
+            raise _FatalError(EX_NOTEMPLATE) from err
+        finally:
+            self._template_changed()
+
+    def load_meta(self):
+        for file in self.paths.files:
+            file.meta_record = None
+        if self.args.meta_file is None:
+            return
+        old_index = self.meta_index
+        self.meta_index = load_meta_file(self.paths.files, file=self.args.meta_file)
+        if old_index is not None:
+            old_index.close()
+
+    def close(self):
+        if self.meta_index is not None:
+            self.meta_index.close()
+
+    def poll(self):
+        """Reload the inputs that changed, and return True if any did.
+
+        Raise _FatalError if an input can't be reloaded.
+        """
+        args = self.args
+        first = not self.signatures
+        paths_changed = False
+        if self._changed("files_from", args.files_from) or first:
+            paths_changed = self.load_paths()
+        template_changed = first or self._template_changed()
+        if template_changed:
+            self.load_template()
+        data_changed = self._changed("data_file", args.data_file)
+        if data_changed:
+            self.data = load_data_file(file=args.data_file)
+        meta_changed = self._changed("meta_file", args.meta_file) or \
+            (paths_changed and args.meta_file is not None)
+        if meta_changed:
+            self.load_meta()
+        return paths_changed or template_changed or data_changed or meta_changed
+
+    def render(self):
+        """Render the document, replacing the output only if it changed."""
+        from jinja2 import TemplateError
+
+        context = {"title": self.title, "files": self.paths.files,
+                   "data": self.data, "pagination": None}
+        try:
+            with replace_atomically(self.args.output, if_changed=True) as outfile:
+                emit(outfile, self.template, context,
+                     compressed_path=self.args.output if self.args.precompress
+                     else None)
+        except TemplateError as err:
+            logging.error("unable to render template: %s", err)
+            raise _FatalError(EX_NOTEMPLATE) from err
+        except OSError as err:
+            logging.error("unable to write to output: %s", err)
+            raise _FatalError(EX_OUTPUT) from err
+
+
+def watch(args, env, title, interval=WATCH_INTERVAL):
+    """Render the document of *args*, and again whenever its inputs change.
+
+    Check for changes every *interval* seconds until interrupted. Errors
+    after the first rendering are logged, and the document is rendered again
+    once the inputs are fixed.
+    """
+    watcher = Watcher(args, env, title)
+    try:
+        watcher.poll()
+        watcher.render()
+    except _FatalError as err:
+        watcher.close()
+        return err.status
+    logging.info("watching for changes")
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                if watcher.poll():
+                    watcher.render()
+                    logging.info("rendered %s", args.output)
+            except _FatalError:
+                # Already logged; try again after the next change
+                pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return EX_OK
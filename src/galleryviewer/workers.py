@@ -0,0 +1,39 @@
+"""Share a renderer with the processes of a pool that render documents.
+
+Tasks are sent to worker processes by name, like an index or a
+directory, and rendered with the renderer of the process: one inherited
+when the worker is forked, or else created by init_worker() when the
+worker starts.
+"""
+
+from contextlib import contextmanager
+
+# The renderer of the current process, under the key "renderer"
+_CURRENT = {}  # type: dict
+
+
+@contextmanager
+def process_renderer(renderer):
+    """Make *renderer* the renderer of this process within the block.
+
+    Worker processes forked within the block inherit it.
+    """
+    _CURRENT["renderer"] = renderer
+    try:
+        yield renderer
+    finally:
+        _CURRENT.pop("renderer", None)
+
+
+def init_worker(factory, args, kwargs):
+    """Create the renderer of a worker process, unless it was inherited.
+
+    The renderer is created by calling *factory* with *args* and *kwargs*.
+    """
+    if "renderer" not in _CURRENT:
+        _CURRENT["renderer"] = factory(*args, **kwargs)
+
+
+def current_renderer():
+    """Return the renderer of this process."""
+    return _CURRENT["renderer"]
@@ -0,0 +1,18 @@
+"""Fixtures shared by the test modules."""
+
+import pytest
+
+import galleryviewer.main
+
+
+@pytest.fixture
+def patch_config_paths(monkeypatch):
+    """Patch generate_config_paths to return an empty iterator."""
+    monkeypatch.setattr(galleryviewer.main, "generate_config_paths", lambda: iter(()))
+
+
+@pytest.fixture(name="cache_dir", autouse=True)
+def fixture_cache_dir(monkeypatch, tmp_path):
+    """Keep the user cache directory out of the tests."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path / "cache" / "galleryviewer"
@@ -0,0 +1,33 @@
+"""Test the benchmark script on tiny inputs."""
+
+import json
+import pathlib
+import subprocess
+import sys
+
+_SCRIPT = pathlib.Path(__file__).parent.parent / "scripts" / "benchmark.py"
+
+
+def _benchmark(*args):
+    return subprocess.run(
+        [sys.executable, str(_SCRIPT), "--scale", "0.001", "--repeat", "1", *args],
+        capture_output=True, check=False, text=True,
+    )
+
+
+def test_benchmark_baseline(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    assert _benchmark("--baseline", str(baseline_path), "--save").returncode == 0
+    baseline = json.loads(baseline_path.read_text())
+    assert "sort/create_paths/10" in baseline["results"]
+    assert "render/builtin/virtual.html/1" in baseline["results"]
+    # Nothing can be slower than a baseline of infinite times
+    baseline["results"] = {name: float("inf") for name in baseline["results"]}
+    baseline_path.write_text(json.dumps(baseline))
+    assert _benchmark("--baseline", str(baseline_path)).returncode == 0
+    # Everything is slower than a baseline of a nanosecond
+    baseline["results"] = {name: 1e-9 for name in baseline["results"]}
+    baseline_path.write_text(json.dumps(baseline))
+    result = _benchmark("--baseline", str(baseline_path), "--threshold", "0.5")
+    assert result.returncode == 1
+    assert "regression: sort/create_paths/10" in result.stderr
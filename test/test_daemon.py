@@ -0,0 +1,100 @@
+"""Test rendering in a daemon through the client."""
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+import galleryviewer.client
+import galleryviewer.daemon
+import galleryviewer.main
+
+
+@pytest.fixture(name="daemon")
+def fixture_daemon(tmp_path, monkeypatch):
+    """Start a daemon in *tmp_path*, and return the path of its socket."""
+    config_dir = tmp_path / "config" / "galleryviewer"
+    config_dir.mkdir(parents=True)
+    socket_path = tmp_path / "daemon.sock"
+    env = {**os.environ, "XDG_CONFIG_HOME": str(tmp_path / "config"),
+           "XDG_CACHE_HOME": str(tmp_path / "cache")}
+    with subprocess.Popen(
+            [sys.executable, "-m", "galleryviewer", "--daemon", "--socket",
+             str(socket_path)], env=env, stderr=subprocess.DEVNULL) as process:
+        for _ in range(100):
+            if socket_path.exists():
+                break
+            time.sleep(0.05)
+        monkeypatch.chdir(tmp_path)
+        yield socket_path
+        process.send_signal(signal.SIGINT)
+        assert process.wait(timeout=10) == 0
+    assert not socket_path.exists()
+
+
+def test_forward(daemon, tmp_path, capfd):
+    forward = galleryviewer.client.forward
+    assert forward(["--check-sort", "10.jpg", "2.jpg"], str(daemon)) == 0
+    assert capfd.readouterr().out == "2.jpg\n10.jpg\n"
+    assert forward(["-o", "index.html", "1.jpg"], str(daemon)) == 0
+    assert 'data-src="1.jpg"' in (tmp_path / "index.html").read_text()
+    assert forward(["--bogus"], str(daemon)) == 2
+    assert "unrecognized arguments" in capfd.readouterr().err
+    # Changes to the configuration are picked up by the next request
+    (tmp_path / "config" / "galleryviewer" / "config").write_text(
+        "[options]\nsort = none\n")
+    assert forward(["--check-sort", "10.jpg", "2.jpg"], str(daemon)) == 0
+    assert capfd.readouterr().out == "10.jpg\n2.jpg\n"
+
+
+def test_refresh_compiles_changed_templates(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    config_dir = tmp_path / "config" / "galleryviewer"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config").write_text(f"[profiles]\nmine = {tmp_path / 'mine'}\n")
+    page_path = tmp_path / "mine" / "page.html"
+    page_path.parent.mkdir()
+    page_path.write_text("one")
+    daemon = galleryviewer.daemon.Daemon()
+    daemon.refresh()
+    template = daemon.templates["mine/page.html"]
+    assert template.render() == "one"
+
+    def list_templates(**_):
+        raise AssertionError("templates listed again")
+
+    # Unchanged templates are neither listed nor compiled again
+    monkeypatch.setattr(daemon.env, "list_templates", list_templates)
+    daemon.refresh()
+    assert daemon.templates["mine/page.html"] is template
+    page_path.write_text("two")
+    stat = page_path.stat()
+    os.utime(page_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    daemon.refresh()
+    assert daemon.templates["mine/page.html"].render() == "two"
+    page_path.unlink()
+    daemon.refresh()
+    assert "mine/page.html" not in daemon.templates
+
+
+def test_forward_without_daemon(tmp_path):
+    assert galleryviewer.client.forward(["1.jpg"], str(tmp_path / "none.sock")) is None
+
+
+def test_client_runs_locally(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("GALLERYVIEWER_SOCKET", str(tmp_path / "none.sock"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    assert galleryviewer.client.main(["--check-sort", "10.jpg", "2.jpg"]) == 0
+    assert capsys.readouterr().out == "2.jpg\n10.jpg\n"
+
+
+@pytest.mark.parametrize("argv", [["--daemon", "1.jpg"],
+                                  ["--socket", "x.sock", "1.jpg"]])
+def test_daemon_errors(argv, monkeypatch):
+    monkeypatch.setattr(galleryviewer.main, "generate_config_paths", lambda: iter(()))
+    with pytest.raises(SystemExit):
+        galleryviewer.main.main(argv)
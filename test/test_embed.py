@@ -0,0 +1,87 @@
+"""Test embedding images into documents."""
+
+import base64
+import io
+import json
+import re
+
+import pytest
+
+import galleryviewer.embed
+import galleryviewer.main
+
+pytestmark = pytest.mark.usefixtures("patch_config_paths")
+
+
+@pytest.fixture(name="images")
+def fixture_images(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    images = {"a.png": bytes(range(256)) * 300, "b c.jpg": b"\xff\xd8\xff" * 7,
+              "empty.gif": b""}
+    for name, content in images.items():
+        (tmp_path / name).write_bytes(content)
+    return images
+
+
+@pytest.mark.parametrize("chunk_size", [3, 6 * 1024, 3 * 2**20])
+def test_encode_chunks(images, chunk_size):
+    for name, content in images.items():
+        with open(name, 'rb') as file:
+            encoded = "".join(galleryviewer.embed.encode_chunks(file, chunk_size))
+        assert base64.b64decode(encoded) == content
+
+
+def _sources(text):
+    return re.findall('data-src="([^"]*)"', text)
+
+
+def test_embed_option(images, tmp_path):
+    argv = ["--embed", "-o", "out.html", *images, "missing.jpg"]
+    assert galleryviewer.main.main(argv) == galleryviewer.main.EX_OK
+    sources = _sources((tmp_path / "out.html").read_text())
+    assert sources[-1] == "missing.jpg"
+    embedded = dict(zip(["a.png", "b c.jpg", "empty.gif"], sources))
+    for name, uri in embedded.items():
+        header, encoded = uri.split(",")
+        assert header == f"data:{galleryviewer.embed.MEDIA_TYPES[name[-4:]]};base64"
+        assert base64.b64decode(encoded) == images[name]
+    argv = ["--embed", "--embed-max-size", "1K", "-o", "out.html", *images]
+    assert galleryviewer.main.main(argv) == galleryviewer.main.EX_OK
+    sources = _sources((tmp_path / "out.html").read_text())
+    assert sources[0] == "a.png"
+    assert sources[1].startswith("data:image/jpeg;base64,")
+
+
+def test_embed_virtual(images, capsys):
+    argv = ["--embed", "-p", "builtin/virtual.html", *images]
+    assert galleryviewer.main.main(argv) == galleryviewer.main.EX_OK
+    output = capsys.readouterr().out
+    sources = json.loads(re.search(
+        '<script id="source-list" type="application/json">(.*?)</script>',
+        output).group(1))
+    assert [base64.b64decode(uri.split(",")[1]) for uri in sources] == \
+        list(images.values())
+    assert galleryviewer.main.main(["-p", "builtin/virtual.html", *images]) == 0
+    assert 'id="source-list"' not in capsys.readouterr().out
+
+
+def test_embedder_unreadable_image(images, tmp_path, caplog):
+    files = galleryviewer.main.create_paths(images)
+    embedder = galleryviewer.embed.embed_files(files)
+    (tmp_path / "b c.jpg").unlink()
+    outfile = io.StringIO()
+    source = galleryviewer.main.get_environment([]).from_string(
+        "{% for file in files %}{{ file.src }}\n{% endfor %}")
+    galleryviewer.main.emit(outfile, source, {"files": files}, embedder=embedder)
+    assert outfile.getvalue().splitlines()[1] == "b%20c.jpg"
+    assert "unable to embed image" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "options",
+    [["--embed-max-size", "1K"], ["--embed-max-size", "-1", "--embed"],
+     ["--embed", "--output-dir", "pages"], ["--embed", "--incremental", "-o", "x"]],
+)
+def test_embed_errors(options):
+    with pytest.raises(SystemExit):
+        galleryviewer.main.main([*options, "1.jpg"])
@@ -0,0 +1,65 @@
+"""Unit test functions in imageinfo module."""
+
+import io
+import struct
+
+import pytest
+
+import galleryviewer.imageinfo
+import galleryviewer.main
+
+_PNG = b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", 640, 480) + bytes(5)
+_GIF = b"GIF89a" + struct.pack("<HH", 640, 480) + bytes(8)
+_JPEG = (b"\xff\xd8"
+         + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + bytes(9)
+         + b"\xff\xff\xc0" + struct.pack(">HBHH", 17, 8, 480, 640) + bytes(12))
+_VP8 = (b"VP8 " + struct.pack("<I", 10) + bytes(3) + b"\x9d\x01\x2a"
+        + struct.pack("<HH", 640, 480))
+_VP8L = (b"VP8L" + struct.pack("<I", 5) + b"\x2f"
+         + ((640 - 1) | (480 - 1) << 14).to_bytes(4, "little"))
+_VP8X = (b"VP8X" + struct.pack("<I", 10) + bytes(4)
+         + (640 - 1).to_bytes(3, "little") + (480 - 1).to_bytes(3, "little"))
+
+
+def _webp(chunk):
+    return b"RIFF" + struct.pack("<I", len(chunk) + 4) + b"WEBP" + chunk
+
+
+@pytest.mark.parametrize(
+    ("header", "format_name"),
+    [(_PNG, "png"), (_GIF, "gif"), (_JPEG, "jpeg"),
+     (_webp(_VP8), "webp"), (_webp(_VP8L), "webp"), (_webp(_VP8X), "webp")],
+)
+def test_read_image_size(header, format_name):
+    result = galleryviewer.imageinfo.read_image_size(io.BytesIO(header + bytes(100)))
+    assert result == (format_name, (640, 480))
+
+
+@pytest.mark.parametrize("header", [b"", b"not an image", _PNG[:8]])
+def test_read_image_size_unknown(header):
+    format_name, dimensions = galleryviewer.imageinfo.read_image_size(
+        io.BytesIO(header))
+    assert dimensions is None
+    assert format_name in {None, "png"}
+
+
+def test_probe_images_cache(tmp_path, monkeypatch):
+    (tmp_path / "a.png").write_bytes(_PNG)
+    (tmp_path / "b.gif").write_bytes(_GIF)
+    files = galleryviewer.main.create_paths(["a.png", "b.gif", "missing.jpg"])
+    cache_path = tmp_path / "cache" / "imageinfo.sqlite3"
+    cache = galleryviewer.imageinfo.ImageInfoCache(cache_path)
+    galleryviewer.imageinfo.probe_images(files, cache=cache, directory=tmp_path)
+    expected = [
+        galleryviewer.imageinfo.ImageInfo(640, 480, len(_PNG), "png"),
+        galleryviewer.imageinfo.ImageInfo(640, 480, len(_GIF), "gif"),
+        None,
+    ]
+    assert [file.info for file in files] == expected
+    # Unchanged files are not read again
+    def fail(*_):
+        raise AssertionError("file was probed")
+    monkeypatch.setattr(galleryviewer.imageinfo, "probe_image", fail)
+    galleryviewer.imageinfo.probe_images(files, cache=cache, directory=tmp_path)
+    assert [file.info for file in files] == expected
+    cache.close()
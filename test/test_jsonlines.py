@@ -0,0 +1,58 @@
+"""Unit test functions in jsonlines module."""
+
+import pytest
+
+import galleryviewer.jsonlines
+import galleryviewer.main
+
+
+def _index(tmp_path, content):
+    path = tmp_path / "meta.jsonl"
+    path.write_bytes(content)
+    return galleryviewer.jsonlines.JsonLinesIndex(open(path, 'rb'))
+
+
+def test_scan(tmp_path):
+    content = b'{"path": "a.jpg"}\n\n{"path": "b.jpg", "n": 1}'
+    with _index(tmp_path, content) as index:
+        assert list(index.scan()) == [
+            ("a.jpg", 0, 17, {"path": "a.jpg"}),
+            ("b.jpg", 19, 44, {"path": "b.jpg", "n": 1})]
+
+
+def test_scan_empty_file(tmp_path):
+    with _index(tmp_path, b"") as index:
+        assert not list(index.scan())
+
+
+@pytest.mark.parametrize(
+    ("content", "lineno"),
+    [(b'{"path": "a.jpg"}\n{', 2), (b'\n["a.jpg"]\n', 2), (b'{"path": 1}\n', 1)],
+)
+def test_scan_errors(tmp_path, content, lineno):
+    with _index(tmp_path, content) as index:
+        with pytest.raises(galleryviewer.jsonlines.JsonLinesError) as excinfo:
+            list(index.scan())
+    assert excinfo.value.lineno == lineno
+
+
+def test_join(tmp_path):
+    content = (b'{"path": "a.jpg", "n": 1}\n{"path": "c.jpg"}\n'
+               b'{"path": "a.jpg", "n": 2}\n')
+    files = galleryviewer.main.create_paths(["a.jpg", "b.jpg", "a.jpg"], "none")
+    with _index(tmp_path, content) as index:
+        index.join(files)
+        assert [file.meta for file in files] == [
+            {"path": "a.jpg", "n": 2}, None, {"path": "a.jpg", "n": 2}]
+
+
+def test_record_decoded_once(tmp_path, monkeypatch):
+    files = galleryviewer.main.create_paths(["a.jpg"], "none")
+    decoded = []
+    real_loads = galleryviewer.jsonlines.json.loads
+    monkeypatch.setattr(galleryviewer.jsonlines.json, "loads",
+                        lambda data: decoded.append(data) or real_loads(data))
+    with _index(tmp_path, b'{"path": "a.jpg", "n": 1}\n') as index:
+        index.join(files)
+        assert files[0].meta is files[0].meta
+    assert len(decoded) == 1
@@ -1,6 +1,12 @@
 """Test galleryviewer's command-line interface."""
 
+import gzip
+import io
+import json
+import logging
+import os
 import pathlib
+import pstats
 import subprocess
 
 import pytest
@@ -10,11 +16,7 @@ import galleryviewer.main
 _EXE = "galleryviewer"
 _TEST_PATHS = ["1.jpg", "10.jpg", "2.jpg"]
 
-
-@pytest.fixture(autouse=True)
-def patch_config_paths(monkeypatch):
-    """Patch generate_config_paths to return an empty iterator."""
-    monkeypatch.setattr(galleryviewer.main, "generate_config_paths", lambda: iter(()))
+pytestmark = pytest.mark.usefixtures("patch_config_paths")
 
 
 def _check_output(output, title=""):
@@ -53,7 +55,8 @@ def test_check_sort_output(capsys, sort_arg, expected):
 
 
 @pytest.mark.parametrize(
-    "profile_arg", ["builtin", "builtin/default.html", "builtin/dark.html"]
+    "profile_arg",
+    ["builtin", "builtin/default.html", "builtin/dark.html", "builtin/virtual.html"],
 )
 def test_builtin_profiles(profile_arg):
     returncode = _main_no_test(options=["--profile", profile_arg])
@@ -68,10 +71,25 @@ def test_output(capsys):
     assert _check_output(output, title=title)
 
 
-def test_test_paths_failure(tmp_path):
+def test_test_paths_failure(tmp_path, caplog):
     paths_to_check = [str(tmp_path / path_name) for path_name in _TEST_PATHS]
     returncode = galleryviewer.main.main(["--test", *paths_to_check])
     assert returncode == galleryviewer.main.EX_TESTFAIL
+    assert all(path in caplog.text for path in paths_to_check)
+
+
+def test_test_paths_success(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "dir").mkdir()
+    for path_name in ["1.jpg", "sub/2.jpg"]:
+        (tmp_path / path_name).touch()
+    options = ["--test", "--output", "index.html"]
+    returncode = galleryviewer.main.main(
+        [*options, "1.jpg", "sub/2.jpg", "sub/../1.jpg"])
+    assert returncode == galleryviewer.main.EX_OK
+    returncode = galleryviewer.main.main([*options, "1.jpg", "sub/dir"])
+    assert returncode == galleryviewer.main.EX_TESTFAIL
 
 
 def test_fatal_errors_data_file_path(tmp_path):
@@ -100,3 +118,367 @@ def test_file_output_option(tmp_path):
     returncode = _main_no_test(options=["--output", str(output_file_path)])
     assert returncode == galleryviewer.main.EX_OK
     assert _check_output(output_file_path.read_text(), title=pathlib.Path.cwd().name)
+
+
+@pytest.mark.parametrize("incremental", [[], ["--incremental"]])
+def test_fatal_errors_output_path(tmp_path, incremental):
+    output_path = tmp_path / "missing" / "output.html"
+    returncode = _main_no_test(options=[*incremental, "--output", str(output_path)])
+    assert returncode == galleryviewer.main.EX_OUTPUT
+
+
+def _strict_stdin(data):
+    return io.TextIOWrapper(io.BytesIO(data), encoding="UTF-8", errors="strict")
+
+
+@pytest.mark.parametrize("stdin", [False, True])
+@pytest.mark.parametrize("delimiter", ["\n", "\0"])
+def test_files_from(capsys, monkeypatch, tmp_path, delimiter, stdin):
+    paths = delimiter.join(_TEST_PATHS[1:]) + delimiter
+    if stdin:
+        monkeypatch.setattr("sys.stdin", _strict_stdin(paths.encode()))
+        files_from = "-"
+    else:
+        files_from = tmp_path / "paths.txt"
+        files_from.write_text(paths)
+    options = ["--check-sort", "--files-from", str(files_from)]
+    if delimiter == "\0":
+        options.append("-0")
+    returncode = galleryviewer.main.main([*options, _TEST_PATHS[0]])
+    assert returncode == galleryviewer.main.EX_OK
+    assert capsys.readouterr().out.splitlines() == ["1.jpg", "2.jpg", "10.jpg"]
+
+
+def test_files_from_stdin_bytes(monkeypatch):
+    # Names are read like from a file, whatever the encoding of sys.stdin
+    monkeypatch.setattr("sys.stdin", _strict_stdin(b"caf\xe9.jpg\0a\rb.jpg\0"))
+    paths = galleryviewer.main.generate_path_args([], "-", "\0")
+    assert list(paths) == ["caf\udce9.jpg", "a\rb.jpg"]
+
+
+def test_files_from_errors(tmp_path):
+    with pytest.raises(SystemExit):
+        galleryviewer.main.main(["--no-test"])
+    options = ["--files-from", str(tmp_path / "no_such_file")]
+    returncode = galleryviewer.main.main(options)
+    assert returncode == galleryviewer.main.EX_NOINPUT
+
+
+def test_output_dir_pages(tmp_path):
+    output_dir = tmp_path / "gallery"
+    options = ["--output-dir", str(output_dir), "--page-size", "2"]
+    returncode = _main_no_test(options=options)
+    assert returncode == galleryviewer.main.EX_OK
+    pages = sorted(path.name for path in output_dir.iterdir())
+    assert pages == ["index.html", "page1.html", "page2.html"]
+    first_page = (output_dir / "page1.html").read_text()
+    assert _check_output(first_page) and 'href="page2.html"' in first_page
+    assert 'href="page1.html"' in (output_dir / "index.html").read_text()
+
+
+def test_page_size_requires_output_dir():
+    with pytest.raises(SystemExit):
+        _main_no_test(options=["--page-size", "2"])
+
+
+def test_virtual_profile_file_list(capsys):
+    returncode = _main_no_test(options=["--profile", "builtin/virtual.html"])
+    assert returncode == galleryviewer.main.EX_OK
+    output = capsys.readouterr().out
+    assert _check_output(output)
+    assert '["1.jpg","2.jpg","10.jpg"]' in output
+    assert 'class="tab"' not in output
+
+
+def test_images_load_lazily(capsys):
+    returncode = _main_no_test()
+    assert returncode == galleryviewer.main.EX_OK
+    output = capsys.readouterr().out
+    assert all(f'data-src="{path}"' in output for path in _TEST_PATHS)
+    assert ' src="' not in output
+
+
+def test_bytecode_cache(capsys, tmp_path, cache_dir):
+    template_file_path = tmp_path / "template.jinja2"
+    template_file_path.write_text("{% for file in files %}{{ file.arg }} {% endfor %}")
+    for _ in range(2):
+        returncode = _main_no_test(options=["--template", str(template_file_path)])
+        assert returncode == galleryviewer.main.EX_OK
+        assert capsys.readouterr().out == "1.jpg 2.jpg 10.jpg "
+    assert len(list((cache_dir / "bytecode").iterdir())) == 1
+    returncode = _main_no_test()
+    assert returncode == galleryviewer.main.EX_OK
+    assert len(list((cache_dir / "bytecode").iterdir())) > 1
+
+
+def test_no_bytecode_cache(cache_dir):
+    returncode = _main_no_test(options=["--no-cache"])
+    assert returncode == galleryviewer.main.EX_OK
+    assert not cache_dir.exists()
+
+
+@pytest.mark.parametrize("jobs", [["--jobs", "1"], ["--jobs", "2"], []])
+def test_recursive(tmp_path, jobs):
+    for path_name in ["a/1.jpg", "a/10.jpg", "a/2.jpg", "a/b/c/1.png", "d/notes.txt"]:
+        (tmp_path / path_name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path_name).touch()
+    returncode = galleryviewer.main.main(["--recursive", str(tmp_path), *jobs])
+    assert returncode == galleryviewer.main.EX_OK
+    outputs = sorted(path.relative_to(tmp_path)
+                     for path in tmp_path.rglob("index.html"))
+    assert outputs == [pathlib.Path("a/b/c/index.html"), pathlib.Path("a/index.html")]
+    output = (tmp_path / "a" / "index.html").read_text()
+    assert _check_output(output, title="a")
+    assert output.index('"2.jpg"') < output.index('"10.jpg"')
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_recursive_template_from_stdin(tmp_path, monkeypatch, jobs):
+    for path_name in ["a/1.jpg", "b/2.jpg"]:
+        (tmp_path / path_name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path_name).touch()
+    template = "{% for file in files %}{{ file.arg }}{% endfor %}"
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(template.encode())))
+    argv = ["--recursive", str(tmp_path), "--template", "-", "--jobs", jobs]
+    assert galleryviewer.main.main(argv) == galleryviewer.main.EX_OK
+    assert (tmp_path / "a" / "index.html").read_text() == "1.jpg"
+    assert (tmp_path / "b" / "index.html").read_text() == "2.jpg"
+
+
+def test_recursive_errors(tmp_path):
+    with pytest.raises(SystemExit):
+        galleryviewer.main.main(["--recursive", str(tmp_path), *_TEST_PATHS])
+    with pytest.raises(SystemExit):
+        _main_no_test(options=["--jobs", "2"])
+    for option in ["--incremental", "--page-size=2"]:
+        with pytest.raises(SystemExit):
+            galleryviewer.main.main(["--recursive", str(tmp_path), option])
+    options = ["--recursive", str(tmp_path), "--profile", "builtin/nonexistent"]
+    returncode = galleryviewer.main.main(options)
+    assert returncode == galleryviewer.main.EX_NOTEMPLATE
+
+
+def test_incremental(tmp_path, cache_dir, caplog):
+    caplog.set_level(logging.INFO)
+    output_file_path = tmp_path / "output.html"
+    options = ["--incremental", "--output", str(output_file_path)]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    mtime_ns = output_file_path.stat().st_mtime_ns
+    caplog.clear()
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    assert "up to date" in caplog.text
+    # Without a manifest, the identical output is not rewritten
+    for manifest in (cache_dir / "manifests").iterdir():
+        manifest.unlink()
+    caplog.clear()
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    assert "up to date" not in caplog.text
+    assert output_file_path.stat().st_mtime_ns == mtime_ns
+    # Changed inputs are rendered
+    returncode = _main_no_test(options=[*options, "--title", "New"])
+    assert returncode == galleryviewer.main.EX_OK
+    assert "<title>New</title>" in output_file_path.read_text()
+    files = [path.name for path in tmp_path.iterdir() if path.is_file()]
+    assert files == ["output.html"]
+
+
+def test_incremental_requires_output():
+    with pytest.raises(SystemExit):
+        _main_no_test(options=["--incremental"])
+
+
+def test_probe(capsys, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    png = b"\x89PNG\r\n\x1a\n\0\0\0\x0dIHDR\0\0\x02\x80\0\0\x01\xe0"
+    (tmp_path / "1.png").write_bytes(png)
+    returncode = galleryviewer.main.main(["--probe", "1.png", "2.png"])
+    assert returncode == galleryviewer.main.EX_OK
+    output = capsys.readouterr().out
+    assert 'data-src="1.png" width="640" height="480"' in output
+    assert 'data-src="2.png" />' in output
+
+
+def test_probe_incremental(tmp_path, monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.chdir(tmp_path)
+    png = b"\x89PNG\r\n\x1a\n\0\0\0\x0dIHDR\0\0\x02\x80\0\0\x01\xe0"
+    (tmp_path / "1.png").write_bytes(png)
+    options = ["--probe", "--incremental", "-o", "index.html", "1.png"]
+    assert galleryviewer.main.main(options) == galleryviewer.main.EX_OK
+    caplog.clear()
+    assert galleryviewer.main.main(options) == galleryviewer.main.EX_OK
+    assert "up to date" in caplog.text
+    # Resized images are rendered again with their new size
+    (tmp_path / "1.png").write_bytes(png[:-4] + b"\0\0\x01\x00")
+    caplog.clear()
+    assert galleryviewer.main.main(options) == galleryviewer.main.EX_OK
+    assert "up to date" not in caplog.text
+    assert 'width="640" height="256"' in (tmp_path / "index.html").read_text()
+
+
+def test_sort_by_mtime_with_test(capsys, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for mtime, path_name in enumerate(reversed(_TEST_PATHS)):
+        (tmp_path / path_name).touch()
+        os.utime(path_name, (mtime, mtime))
+    stat_calls = []
+    real_stat = os.stat
+    monkeypatch.setattr(
+        os, "stat",
+        lambda path, **kwargs: stat_calls.append(path) or real_stat(path, **kwargs)
+    )
+    options = ["--sort=mtime", "--test", "--output", "out.html"]
+    returncode = galleryviewer.main.main([*options, *_TEST_PATHS])
+    assert returncode == galleryviewer.main.EX_OK
+    # Each file's status is read once, for both sorting and testing
+    image_stat_calls = [call for call in stat_calls if str(call).endswith(".jpg")]
+    assert sorted(image_stat_calls) == sorted(_TEST_PATHS)
+    returncode = galleryviewer.main.main(["--sort=mtime", "--check-sort", *_TEST_PATHS])
+    assert returncode == galleryviewer.main.EX_OK
+    assert capsys.readouterr().out.splitlines() == list(reversed(_TEST_PATHS))
+
+
+def test_meta_file(tmp_path):
+    meta_file_path = tmp_path / "meta.jsonl"
+    meta_file_path.write_text('{"path": "1.jpg", "caption": "One"}\n')
+    template_file_path = tmp_path / "meta.jinja2"
+    template_file_path.write_text(
+        "{% for file in files %}{{ file.arg }}={{ file.meta.caption }};{% endfor %}")
+    options = ["--meta-file", str(meta_file_path),
+               "--template", str(template_file_path),
+               "--output", str(tmp_path / "output.html")]
+    returncode = galleryviewer.main.main(["--no-test", *options, "2.jpg", "1.jpg"])
+    assert returncode == galleryviewer.main.EX_OK
+    assert (tmp_path / "output.html").read_text() == "1.jpg=One;2.jpg=;"
+
+
+def test_fatal_errors_meta_file_path(tmp_path):
+    meta_file_path = tmp_path / "error_file.jsonl"
+    options = ["--meta-file", str(meta_file_path)]
+    returncode = _main_no_test(options=options)
+    assert returncode == galleryviewer.main.EX_NOINPUT
+    meta_file_path.write_bytes(b'{"path": "1.jpg"}\n["not", "an", "object"]\n')
+    returncode = _main_no_test(options=options)
+    assert returncode == galleryviewer.main.EX_JSONERR
+
+
+def test_timings(capsys):
+    options = ["--timings", "--output", os.devnull]
+    returncode = galleryviewer.main.main(["--test", *options, *_TEST_PATHS])
+    assert returncode == galleryviewer.main.EX_TESTFAIL
+    record = json.loads(capsys.readouterr().err.splitlines()[-1])
+    assert record["status"] == galleryviewer.main.EX_TESTFAIL
+    assert [phase["name"] for phase in record["phases"]] == ["config", "paths", "test"]
+    assert record["wall"] >= sum(phase["wall"] for phase in record["phases"])
+    _main_no_test(options=options)
+    record = json.loads(capsys.readouterr().err)
+    assert [phase["name"] for phase in record["phases"]] == [
+        "config", "paths", "environment", "data", "template", "render"]
+
+
+def test_profile_out(tmp_path):
+    profile_path = tmp_path / "run.prof"
+    returncode = _main_no_test(options=["--profile-out", str(profile_path),
+                                        "--output", os.devnull])
+    assert returncode == galleryviewer.main.EX_OK
+    stats = pstats.Stats(str(profile_path))
+    assert any(function == "emit" for _, _, function in stats.stats)
+
+
+def test_minify(tmp_path):
+    plain_path = tmp_path / "plain.html"
+    minified_path = tmp_path / "minified.html"
+    returncode = _main_no_test(options=["--output", str(plain_path)])
+    assert returncode == galleryviewer.main.EX_OK
+    options = ["--minify", "--output", str(minified_path)]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    plain, minified = plain_path.read_text(), minified_path.read_text()
+    assert _check_output(minified)
+    assert len(minified) < len(plain)
+    assert "/* Adjust this */" in plain and "/* Adjust this */" not in minified
+    assert "// Show page" in plain and "// Show page" not in minified
+
+
+def test_precompress(tmp_path):
+    output_file_path = tmp_path / "output.html"
+    options = ["--precompress", "--output", str(output_file_path)]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    compressed = (tmp_path / "output.html.gz").read_bytes()
+    assert gzip.decompress(compressed) == output_file_path.read_bytes()
+    options = ["--precompress", "--output-dir", str(tmp_path / "pages"),
+               "--page-size", "2"]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    for name in ["index.html", "page1.html", "page2.html"]:
+        page_path = tmp_path / "pages" / name
+        compressed = page_path.with_name(f"{name}.gz").read_bytes()
+        assert gzip.decompress(compressed) == page_path.read_bytes()
+    assert not list(tmp_path.rglob("*.tmp"))
+    with pytest.raises(SystemExit):
+        _main_no_test(options=["--precompress"])
+
+
+def test_precompress_incremental(tmp_path):
+    output_file_path = tmp_path / "output.html"
+    compressed_path = tmp_path / "output.html.gz"
+    options = ["--incremental", "--output", str(output_file_path)]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    options.append("--precompress")
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    assert gzip.decompress(compressed_path.read_bytes()) == \
+        output_file_path.read_bytes()
+    # Unchanged compressed copies are left alone too
+    os.utime(compressed_path, (0, 0))
+    output_file_path.touch()
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    assert compressed_path.stat().st_mtime == 0
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_several_outputs(tmp_path, jobs):
+    profiles = ["builtin/default.html", "builtin/dark.html", "builtin/virtual.html"]
+    options = ["--jobs", jobs]
+    for ind, profile in enumerate(profiles):
+        options += ["-p", profile, "-o", str(tmp_path / f"{ind}.html")]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    for ind, profile in enumerate(profiles):
+        single_path = tmp_path / f"single{ind}.html"
+        assert _main_no_test(options=["-p", profile, "-o", str(single_path)]) == 0
+        assert (tmp_path / f"{ind}.html").read_text() == single_path.read_text()
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_several_outputs_unwritable(tmp_path, jobs):
+    options = ["--jobs", jobs,
+               "-p", "builtin/default.html", "-o", str(tmp_path / "missing" / "a.html"),
+               "-p", "builtin/dark.html", "-o", str(tmp_path / "b.html")]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OUTPUT
+    assert _check_output((tmp_path / "b.html").read_text())
+
+
+def test_several_outputs_incremental(tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    options = ["--incremental",
+               "-p", "builtin/default.html", "-o", str(tmp_path / "a.html"),
+               "-p", "builtin/dark.html", "-o", str(tmp_path / "b.html")]
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    (tmp_path / "b.html").unlink()
+    caplog.clear()
+    assert _main_no_test(options=options) == galleryviewer.main.EX_OK
+    assert "a.html is up to date" in caplog.text
+    assert "b.html is up to date" not in caplog.text
+    assert (tmp_path / "b.html").exists()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [["-o", "a.html", "-o", "b.html"],
+     ["-p", "builtin", "-o", "a.html", "-p", "builtin", "-o", "a.html"],
+     ["-p", "builtin", "-o", "a.html", "-p", "builtin", "-o", "-"],
+     ["-t", "x.html", "-p", "builtin", "-o", "a.html", "-p", "builtin", "-o", "b.html"],
+     ["--jobs", "2", "-o", "a.html"]],
+)
+def test_several_outputs_errors(tmp_path, monkeypatch, options):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit):
+        _main_no_test(options=options)
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,51 @@
+"""Test the Python API of galleryviewer."""
+
+import io
+
+import jinja2
+import pytest
+
+import galleryviewer
+import galleryviewer.renderer
+
+
+@pytest.fixture(name="renderer")
+def fixture_renderer(tmp_path):
+    (tmp_path / "list.html").write_text(
+        "{{ title }}:{% for file in files %} {{ file.arg }}{% endfor %}")
+    return galleryviewer.Renderer({"custom": str(tmp_path)})
+
+
+def test_render(renderer):
+    result = renderer.render(["10.jpg", "2.jpg"], profile="custom/list.html",
+                             title="Title")
+    assert result == "Title: 2.jpg 10.jpg"
+    result = renderer.render(["10.jpg", "2.jpg"], profile="custom/list.html",
+                             sort="ascii")
+    assert result == ": 10.jpg 2.jpg"
+    result = renderer.render(["1.jpg"], source="{{ data.n }} {{ files[0].arg }}",
+                             data={"n": 1})
+    assert result == "1 1.jpg"
+    assert "</html>" in renderer.render(["1.jpg"], profile="builtin")
+
+
+def test_render_to_stream_and_chunks(renderer):
+    paths = [f"{ind}.jpg" for ind in range(1000)]
+    expected = renderer.render(paths)
+    outfile = io.StringIO()
+    renderer.stream(outfile, paths, buffer_size=100)
+    assert outfile.getvalue() == expected
+    assert "".join(renderer.generate(paths)) == expected
+
+
+def test_templates_compiled_once(renderer):
+    source = "{{ files | length }}"
+    assert renderer.get_template(source=source) is renderer.get_template(source=source)
+    assert renderer.get_template("builtin") is renderer.get_template("builtin")
+
+
+def test_template_errors(renderer):
+    with pytest.raises(jinja2.TemplateNotFound):
+        renderer.render(["1.jpg"], profile="custom/missing.html")
+    with pytest.raises(jinja2.TemplateSyntaxError):
+        renderer.render(["1.jpg"], source="{% for %}")
@@ -0,0 +1,72 @@
+"""Test finding image files with the scan module."""
+
+import pytest
+
+import galleryviewer.main
+import galleryviewer.scan
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(tmp_path):
+    for path in ["1.jpg", "2.PNG", "notes.txt", "a/10.jpg", "a/b/3.gif",
+                 "a/b/c/4.webp", "raw/5.jpg", "raw/6.cr2"]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).touch()
+    (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+    return tmp_path
+
+
+def _scan(root, **kwargs):
+    return sorted(galleryviewer.scan.scan_directory(str(root), **kwargs))
+
+
+def test_scan_directory(tree, monkeypatch):
+    assert _scan(tree) == sorted(
+        str(tree / path) for path in ["1.jpg", "2.PNG", "a/10.jpg", "a/b/3.gif",
+                                      "a/b/c/4.webp", "raw/5.jpg"])
+    monkeypatch.chdir(tree)
+    assert _scan(".", max_depth=0) == ["1.jpg", "2.PNG"]
+    assert _scan(".", max_depth=1) == ["1.jpg", "2.PNG", "a/10.jpg", "raw/5.jpg"]
+    assert _scan(".", exclude=["raw", "b"]) == ["1.jpg", "2.PNG", "a/10.jpg"]
+    assert _scan(".", include=["*.cr2", "a/b/c/*"]) == ["a/b/c/4.webp", "raw/6.cr2"]
+    assert _scan("a", exclude=["a/*"]) == ["a/10.jpg", "a/b/3.gif", "a/b/c/4.webp"]
+
+
+def test_scan_directory_order(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    expected = ["1.jpg", "2.PNG", "a/10.jpg", "a/b/3.gif", "a/b/c/4.webp",
+                "raw/5.jpg"]
+    for max_workers in [1, 4]:
+        paths = galleryviewer.scan.scan_directory(".", max_workers=max_workers)
+        assert paths == expected
+
+
+def test_scan_directory_stat_cache(tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    stat_cache = galleryviewer.main.StatCache()
+    paths = galleryviewer.scan.scan_directory(".", stat_cache=stat_cache)
+    assert all(path in stat_cache for path in paths)
+
+
+def test_scan_directory_missing(tmp_path):
+    # pylint: disable-next=protected-access
+    with pytest.raises(galleryviewer.main._FatalError):
+        galleryviewer.scan.scan_directory(str(tmp_path / "missing"))
+
+
+def test_scan_option(capsys, tree, monkeypatch):
+    monkeypatch.chdir(tree)
+    options = ["--check-sort", "--scan", ".", "--scan", "raw", "--exclude", "raw"]
+    assert galleryviewer.main.main([*options, "x.jpg"]) == galleryviewer.main.EX_OK
+    assert capsys.readouterr().out.splitlines() == [
+        "1.jpg", "2.PNG", "a/10.jpg", "a/b/3.gif", "a/b/c/4.webp", "raw/5.jpg",
+        "x.jpg"]
+    # Paths found under both roots are added once, in traversal order
+    options = ["--check-sort", "--sort=none", "--scan", "raw", "--scan", "."]
+    assert galleryviewer.main.main(options) == galleryviewer.main.EX_OK
+    assert capsys.readouterr().out.splitlines() == [
+        "raw/5.jpg", "1.jpg", "2.PNG", "a/10.jpg", "a/b/3.gif", "a/b/c/4.webp"]
+    returncode = galleryviewer.main.main(["--scan", "missing"])
+    assert returncode == galleryviewer.main.EX_NOINPUT
+    with pytest.raises(SystemExit):
+        galleryviewer.main.main(["--include", "*.jpg", "1.jpg"])
@@ -0,0 +1,150 @@
+"""Test the HTTP server of galleryviewer."""
+
+import http.client
+import threading
+
+import pytest
+
+import galleryviewer.cli
+import galleryviewer.main
+import galleryviewer.manifest
+import galleryviewer.server
+
+
+@pytest.fixture(name="serve")
+def fixture_serve(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    servers = []
+
+    def serve(*argv):
+        parser = galleryviewer.cli.get_cla(galleryviewer.main.OPTION_DEFAULTS)
+        args = parser.parse_args(["--serve", *argv])
+        server = galleryviewer.server.make_server(args, [])
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _request(port, path, headers=None, method="GET"):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request(method, path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_document_conditional_get(serve, tmp_path):
+    template_path = tmp_path / "template.jinja2"
+    template_path.write_text("{% for file in files %}{{ file.arg }} {% endfor %}")
+    port = serve("--template", str(template_path), "2.jpg", "1.jpg")
+    response, body = _request(port, "/")
+    assert response.status == 200
+    assert body == b"1.jpg 2.jpg "
+    etag = response.getheader("ETag")
+    last_modified = response.getheader("Last-Modified")
+    response, body = _request(port, "/index.html", {"If-None-Match": etag})
+    assert response.status == 304
+    assert not body
+    response, _ = _request(port, "/", {"If-Modified-Since": last_modified})
+    assert response.status == 304
+    template_path.write_text("{{ files | length }}")
+    response, body = _request(port, "/", {"If-None-Match": etag})
+    assert response.status == 200
+    assert body == b"2"
+    assert response.getheader("ETag") != etag
+
+
+def test_images(serve, tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "1.png").write_bytes(bytes(range(100)))
+    (tmp_path / "secret.txt").write_text("secret")
+    port = serve("sub/1.png")
+    # Images are found among those of the last document
+    response, _ = _request(port, "/images/sub%2F1.png")
+    assert response.status == 404
+    _, body = _request(port, "/")
+    assert b'data-src="/images/sub%2F1.png"' in body
+    response, body = _request(port, "/images/sub%2F1.png")
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "image/png"
+    assert body == bytes(range(100))
+    etag = response.getheader("ETag")
+    response, _ = _request(port, "/images/sub%2F1.png", {"If-None-Match": etag})
+    assert response.status == 304
+    response, body = _request(port, "/images/sub%2f1.png", {"Range": "bytes=10-19"})
+    assert response.status == 206
+    assert response.getheader("Content-Range") == "bytes 10-19/100"
+    assert body == bytes(range(10, 20))
+    response, body = _request(port, "/images/sub%2F1.png", {"Range": "bytes=-5"})
+    assert body == bytes(range(95, 100))
+    response, _ = _request(port, "/images/sub%2F1.png", {"Range": "bytes=100-"})
+    assert response.status == 416
+    response, body = _request(port, "/images/sub%2F1.png", method="HEAD")
+    assert response.getheader("Content-Length") == "100"
+    assert not body
+    # Only the files of the gallery are served
+    for path in ["/secret.txt", "/images/secret.txt", "/images/sub/1.png",
+                 "/sub/1.png", "/images/sub%2F..%2Fsecret.txt"]:
+        response, _ = _request(port, path)
+        assert response.status == 404
+
+
+def test_render_errors(serve, tmp_path):
+    template_path = tmp_path / "template.jinja2"
+    template_path.write_text("{{ files | no_such_filter }}")
+    port = serve("--template", str(template_path), "1.jpg")
+    response, _ = _request(port, "/")
+    assert response.status == 500
+    template_path.write_text("{{ data.missing.attribute }}")
+    response, _ = _request(port, "/")
+    assert response.status == 500
+
+
+def test_serve_errors():
+    for options in [["--port", "8000"], ["--serve", "--output", "out.html"],
+                    ["--serve", "--files-from", "-"], ["--serve", "--port", "65536"]]:
+        with pytest.raises(SystemExit):
+            galleryviewer.main.main([*options, "1.jpg"])
+
+
+def test_images_outside_directory(serve, tmp_path, monkeypatch):
+    (tmp_path / "photos").mkdir()
+    (tmp_path / "photos" / "1.png").write_bytes(b"outside")
+    (tmp_path / "site").mkdir()
+    (tmp_path / "site" / "photos").mkdir()
+    (tmp_path / "site" / "photos" / "1.png").write_bytes(b"inside")
+    (tmp_path / "template.jinja2").write_text(
+        "{% for file in files %}{{ file.src }} {% endfor %}")
+    monkeypatch.chdir(tmp_path / "site")
+    port = serve("--template", "../template.jinja2",
+                 "../photos/1.png", "photos/1.png")
+    _, body = _request(port, "/")
+    urls = body.decode().split()
+    assert urls == ["/images/..%2Fphotos%2F1.png", "/images/photos%2F1.png"]
+    assert [_request(port, url)[1] for url in urls] == [b"outside", b"inside"]
+
+
+def test_unchanged_inputs_not_read_again(serve, tmp_path, monkeypatch):
+    (tmp_path / "data.json").write_text('{"n": 1}')
+    digests = []
+    real_file_digest = galleryviewer.manifest.file_digest
+    monkeypatch.setattr(galleryviewer.manifest, "file_digest",
+                        lambda path: digests.append(path) or real_file_digest(path))
+    scans = []
+    real_create_paths = galleryviewer.server.create_paths
+    monkeypatch.setattr(galleryviewer.server, "create_paths",
+                        lambda *args, **kwargs: scans.append(args)
+                        or real_create_paths(*args, **kwargs))
+    port = serve("--data-file", "data.json", "1.jpg")
+    for _ in range(2):
+        assert _request(port, "/")[0].status == 200
+    assert digests == ["data.json"]
+    assert _request(port, "/favicon.ico")[0].status == 404
+    assert len(scans) == 2
@@ -0,0 +1,43 @@
+"""Test that galleryviewer starts up quickly.
+
+Import times are measured with ``python -X importtime``. Set the environment
+variable GALLERYVIEWER_IMPORT_BUDGET to change the allowed cumulative import
+time of galleryviewer.main in microseconds.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+_IMPORT_BUDGET_US = int(os.getenv("GALLERYVIEWER_IMPORT_BUDGET", "150000"))
+# Modules that no run that renders nothing should import
+_DEFERRED_MODULES = {"jinja2", "json", "hashlib", "concurrent.futures", "dataclasses"}
+
+
+def _import_times(*args):
+    """Run galleryviewer with *args* and return its import times by module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "galleryviewer", *args],
+        capture_output=True, check=True, text=True,
+        env={**os.environ, "XDG_CONFIG_HOME": os.devnull},
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize("args", [["--version"], ["--check-sort", "1.jpg", "2.jpg"]])
+def test_no_deferred_imports(args):
+    imported = _import_times(*args)
+    assert not _DEFERRED_MODULES & imported.keys()
+
+
+def test_import_time_budget():
+    imported = _import_times("--version")
+    assert imported["galleryviewer.main"] <= _IMPORT_BUDGET_US, imported
@@ -3,10 +3,15 @@
 # pylint: disable=too-many-arguments,too-many-positional-arguments
 
 import configparser
+import io
+import os
+import pathlib
+import random
 
 import pytest
 
 import galleryviewer.main
+import galleryviewer.pages
 
 
 class TestConfig:
@@ -40,7 +45,9 @@ class TestConfig:
         config = set_options({"unknown": "value"})
         assert "unknown" not in config.options, "Unknown options are not added"
 
-    @pytest.mark.parametrize("value", {"none", "ascii", "human", "default"})
+    @pytest.mark.parametrize(
+        "value", {"none", "ascii", "human", "default", "mtime", "ctime", "size"}
+    )
     @pytest.mark.parametrize("opt_key", ["sort", "Sort"])
     def test_sort_choices_valid(self, set_options, caplog, opt_key, value):
         config = set_options({opt_key: value})
@@ -84,6 +91,11 @@ class TestConfig:
         else:
             assert config.options["test"] == result_expected
 
+    @pytest.mark.parametrize("opt_key", ["cache", "Cache"])
+    def test_cache_boolean(self, set_options, opt_key):
+        config = set_options({opt_key: "no"})
+        assert config.options["cache"] is False
+
     @pytest.mark.parametrize(
         ("opt_key", "dest", "value"),
         [
@@ -95,3 +107,97 @@ class TestConfig:
     def test_string_options(self, set_options, opt_key, dest, value):
         config = set_options({opt_key: value})
         assert config.options[dest] == value
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1024])
+@pytest.mark.parametrize("delimiter", ["\n", "\0"])
+def test_read_paths(chunk_size, delimiter):
+    paths = ["a b.jpg", "c\nd.jpg" if delimiter == "\0" else "cd.jpg", "10.jpg"]
+    file = io.StringIO(delimiter.join(paths))
+    result = galleryviewer.main.read_paths(file, delimiter, chunk_size=chunk_size)
+    assert list(result) == paths
+
+
+# pylint: disable-next=too-few-public-methods
+class _WriteRecorder:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, string):
+        self.writes.append(string)
+
+
+def test_emit_buffering():
+    env = galleryviewer.main.get_environment([])
+    template = env.from_string("{% for n in range(100) %}{{ n }},{% endfor %}")
+    outfile = _WriteRecorder()
+    galleryviewer.main.emit(outfile, template, {}, buffer_size=16)
+    assert "".join(outfile.writes) == template.render()
+    assert len(outfile.writes) > 1
+    assert all(len(chunk) < 16 * 2 for chunk in outfile.writes)
+
+
+def test_natural_key_matches_alphanum_key():
+    rng = random.Random(0)
+    alphabet = "0019aAz_./"
+    strings = ["".join(rng.choices(alphabet, k=rng.randrange(8))) for _ in range(2000)]
+    expected = sorted(strings, key=galleryviewer.main.alphanum_key)
+    assert sorted(strings, key=galleryviewer.main.natural_key) == expected
+
+
+@pytest.mark.parametrize("sort_method", ["none", "ascii", "human", "default", None])
+def test_create_paths_sort_keys(sort_method):
+    files = galleryviewer.main.create_paths(["b10", "B9", "a"], sort_method)
+    keys = [file.sort_key for file in files]
+    if sort_method == "none":
+        assert keys == [None] * len(files)
+    else:
+        assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize("arg", ["a.jpg", "dir/a.jpg", "/abs/dir/a.jpg",
+                                 "dir//a.jpg", "dir/", "./a.jpg", ""])
+def test_image_path_arg(arg):
+    file = galleryviewer.main.ImagePath(arg, 3)
+    assert file.arg == arg
+    path = file.path
+    assert file.path is path
+    assert str(file.path) == str(pathlib.Path(arg))
+
+
+def test_image_path_shares_directories():
+    first, second = galleryviewer.main.create_paths(["dir/1.jpg", "dir/2.jpg"])
+    # pylint: disable-next=protected-access
+    assert first._directory is second._directory
+    with pytest.raises(AttributeError):
+        first.other = None
+
+
+@pytest.mark.parametrize(
+    ("size", "page_size", "expected"),
+    [(0, None, [0]), (5, None, [5]), (5, 2, [2, 2, 1]), (4, 2, [2, 2])],
+)
+def test_paginate(size, page_size, expected):
+    pages = galleryviewer.pages.paginate(list(range(size)), page_size)
+    assert [len(files) for _, files in pages] == expected
+    assert pages[0][0].previous is None and pages[-1][0].next is None
+    for (pagination, files), (next_pagination, _) in zip(pages, pages[1:]):
+        assert pagination.next == next_pagination.name
+        assert next_pagination.previous == pagination.name
+        assert next_pagination.offset == pagination.offset + len(files)
+
+
+@pytest.mark.parametrize(
+    ("sort_method", "expected"),
+    [("size", ["B9", "b10", "a", "missing"]), ("mtime", ["a", "B9", "b10", "missing"])],
+)
+def test_create_paths_stat_sort(tmp_path, sort_method, expected):
+    for mtime_ns, (name, size) in enumerate([("a", 2), ("B9", 1), ("b10", 1)]):
+        (tmp_path / name).write_bytes(bytes(size))
+        os.utime(tmp_path / name, ns=(mtime_ns * 10**9, mtime_ns * 10**9))
+    stat_cache = galleryviewer.main.StatCache(tmp_path)
+    files = galleryviewer.main.create_paths(
+        ["a", "missing", "b10", "B9"], sort_method, stat_cache=stat_cache
+    )
+    assert [file.arg for file in files] == expected
+    assert "missing" in stat_cache and stat_cache.get("missing") is None
@@ -0,0 +1,130 @@
+"""Test keeping documents up to date with the watch module."""
+
+import os
+import random
+
+import pytest
+
+import galleryviewer.cli
+import galleryviewer.main
+import galleryviewer.watch
+
+
+def _touch(path, text):
+    """Write *text* to *path* and make sure its modification time changes."""
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+@pytest.mark.parametrize("sort_method", ["human", "ascii", "none"])
+def test_sorted_paths_matches_create_paths(sort_method):
+    rng = random.Random(0)
+    key_func = galleryviewer.main.get_key_function(sort_method)
+    paths = galleryviewer.watch.SortedPaths(key_func)
+    args = []
+    for _ in range(300):
+        if args and rng.random() < 0.3:
+            arg = rng.choice(args)
+            # The last added ImagePath of an arg is removed
+            del args[len(args) - 1 - args[::-1].index(arg)]
+            paths.remove(arg)
+        else:
+            arg = f"{rng.choice(['a', 'B', 'img'])}{rng.randrange(20)}.jpg"
+            args.append(arg)
+            paths.add(arg)
+    expected = galleryviewer.main.create_paths(args, sort_method)
+    assert [file.arg for file in paths.files] == [file.arg for file in expected]
+
+
+def test_sorted_paths_update():
+    paths = galleryviewer.watch.SortedPaths(
+        galleryviewer.main.get_key_function("human"))
+    added, removed = paths.update(["10.jpg", "2.jpg", "1.jpg"])
+    assert [file.arg for file in added] == ["10.jpg", "2.jpg", "1.jpg"]
+    assert not removed
+    added, removed = paths.update(["3.jpg", "10.jpg", "1.jpg"])
+    assert [file.arg for file in added] == ["3.jpg"]
+    assert removed
+    assert [file.arg for file in paths.files] == ["1.jpg", "3.jpg", "10.jpg"]
+    assert paths.update(["1.jpg", "3.jpg", "10.jpg"]) == ([], False)
+
+
+def test_sorted_paths_update_unsorted():
+    paths = galleryviewer.watch.SortedPaths()
+    added, _ = paths.update(["a", "b", "a"])
+    assert [file.arg for file in paths.files] == ["a", "b", "a"]
+    assert sorted(file.arg for file in added) == ["a", "a", "b"]
+    paths.update(["b", "a"])
+    added, changed = paths.update(["a", "c", "b"])
+    assert [file.arg for file in added] == ["c"]
+    assert changed
+    assert [file.arg for file in paths.files] == ["a", "c", "b"]
+    assert paths.update(["a", "c", "b"]) == ([], False)
+    assert paths.update(["b", "a", "c"])[1]
+    paths.remove("a")
+    paths.add("d")
+    assert [file.arg for file in paths.files] == ["b", "c", "d"]
+
+
+@pytest.mark.parametrize("sort_method", ["human", "ascii"])
+def test_sorted_paths_update_duplicates(sort_method):
+    paths = galleryviewer.watch.SortedPaths(
+        galleryviewer.main.get_key_function(sort_method))
+    for args in [["b", "a", "b"], ["b", "a"], ["c", "b", "a", "c"]]:
+        paths.update(args)
+        expected = galleryviewer.main.create_paths(args, sort_method)
+        assert [file.arg for file in paths.files] == [file.arg for file in expected]
+
+
+def test_watcher(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    paths_file = tmp_path / "paths.txt"
+    _touch(paths_file, "2.jpg\n1.jpg\n")
+    template_file = tmp_path / "template.jinja2"
+    _touch(template_file, "{% for file in files %}{{ file.arg }} {% endfor %}")
+    data_file = tmp_path / "data.json"
+    _touch(data_file, "{}")
+    output_file = tmp_path / "output.html"
+    parser = galleryviewer.cli.get_cla(galleryviewer.main.OPTION_DEFAULTS)
+    args = parser.parse_args(["--watch", "--files-from", str(paths_file),
+                              "--template", str(template_file),
+                              "--data-file", str(data_file),
+                              "--output", str(output_file)])
+    watcher = galleryviewer.watch.Watcher(
+        args, galleryviewer.main.get_environment([]), "Title")
+    assert watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "1.jpg 2.jpg "
+    assert not watcher.poll()
+    _touch(paths_file, "2.jpg\n3.jpg\n10.jpg\n")
+    assert watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "2.jpg 3.jpg 10.jpg "
+    _touch(template_file, "{{ files | length }} {{ data.n }}")
+    assert watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "3 "
+    _touch(data_file, '{"n": 1}')
+    assert watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "3 1"
+    # Errors are reported, and the last good inputs are kept
+    _touch(template_file, "{% for %}")
+    # pylint: disable-next=protected-access
+    with pytest.raises(galleryviewer.main._FatalError):
+        watcher.poll()
+    assert not watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "3 1"
+    _touch(template_file, "{{ files | length }}")
+    assert watcher.poll()
+    watcher.render()
+    assert output_file.read_text() == "3"
+
+
+def test_watch_errors():
+    for options in [["--watch"], ["--watch", "--output", "-"],
+                    ["--watch", "--output", "out.html", "--files-from", "-"]]:
+        with pytest.raises(SystemExit):
+            galleryviewer.main.main([*options, "1.jpg"])